@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2024, Otto Milvang
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Created on Mon Oct 19 09:12:40 2026
+@author: Otto Milvang, sjakk@milvang.no
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import datetime
+import helpers
+from tiebreak import tiebreak
+from tournamentgenerator import tournamentgenerator
+
+# ==============================
+#
+# Benchmark
+#
+# Startup benchmark:
+#   Each entry point is started with 'python -X importtime' on a small
+#   tournament. The sum of the cumulative import time for all top level
+#   modules and the wall time of the process is measured.
+#
+# Engine benchmark:
+#   Synthetic tournaments (swiss, rr, team) are generated with tournamentgenerator
+#   and written as TRF, TS and JSON. For each file the time for parse,
+#   prepare_competitors, compute_score, each tie-break in compute_tiebreak and
+#   serialization of the result is measured.
+#
+# Results are written as json, and can be compared with a previous run
+#   python benchmark.py --startup --engine -o before.json
+#   python benchmark.py --startup --engine -b before.json
+#
+
+# A small TRF-16 file, 4 players, 3 rounds
+
+smalltrf = '\n'.join([
+    '012 Startup benchmark',
+    'XXR 3',
+    '001    1 m    Alpha, Anna                       2100 NOR         101 2000/01/01  2.5    1     4 w 1     2 b =     3 w 1',
+    '001    2 m    Beta, Bert                        2000 NOR         102 2000/01/01  1.5    2     3 b =     1 w =     4 b =',
+    '001    3 m    Gamma, Gro                        1900 NOR         103 2000/01/01  1.0    3     2 w =     4 b =     1 b 0',
+    '001    4 m    Delta, Dag                        1800 NOR         104 2000/01/01  1.0    4     1 b 0     3 w =     2 w =',
+    ''])
+
+# Default tie-breaks for the engine benchmark
+
+playertiebreaks = ['PTS', 'BH/C1', 'BH', 'SB', 'FB', 'ABH', 'AOB', 'ARO', 'TPR', 'PTP', 'APRO', 'APPO',
+    'DE', 'WIN', 'WON', 'BPG', 'BWG', 'GE', 'REP', 'VUR', 'KS', 'PS']
+teamtiebreaks = ['MPTS', 'GPTS', 'BH', 'SB', 'FB', 'ESB', 'EMGSB', 'DE', 'MPVGP', 'BC', 'TBR', 'BBE', 'WIN', 'KS']
+
+
+# ==============================
+#
+# tiebreak with timing of each step
+#
+
+class timedtiebreak(tiebreak):
+
+    def __init__(self, chessevent, tournamentno, currentround, params):
+        self.timing = {'prepare_competitors': 0.0, 'compute_score': 0.0, 'tiebreaks': {}}
+        self.tbnames = params['tie_break']
+        super().__init__(chessevent, tournamentno, currentround, params)
+
+    def prepare_competitors(self, *args):
+        start = time.perf_counter()
+        cmps = super().prepare_competitors(*args)
+        self.timing['prepare_competitors'] += time.perf_counter() - start
+        return cmps
+
+    def compute_score(self, *args):
+        start = time.perf_counter()
+        ret = super().compute_score(*args)
+        self.timing['compute_score'] += time.perf_counter() - start
+        return ret
+
+    def compute_tiebreak(self, tb):
+        name = self.tbnames[tb['order'] - 1]
+        start = time.perf_counter()
+        ret = super().compute_tiebreak(tb)
+        self.timing['tiebreaks'][name] = time.perf_counter() - start
+        return ret
+
+
+class benchmark:
+
+    # constructor function
+    def __init__(self):
+        self.root = os.path.dirname(os.path.abspath(__file__))
+        self.params = None
+        self.results = {
+            'filetype': 'Benchmark',
+            'version': '1.0',
+            'origin': 'benchmark ver. 1.00',
+            'published': str(datetime.datetime.now())[0:19],
+            'python': sys.version.split()[0],
+            'startup': {},
+            'engine': {}
+            }
+
+    # read_command_line
+    #   options:
+    #   -s = startup
+    #   -E = engine
+    #   -T = tournament type
+    #   -N = number of players (teams)
+    #   -R = number of rounds
+    #   -B = boards (team size)
+    #   -F = file format
+    #   -t = tie-break
+    #   -k = keep generated files in directory
+    #   -r = repeat
+    #   -o = output-file
+    #   -b = baseline
+
+    def read_command_line(self):
+        parser = argparse.ArgumentParser()
+        parser.add_argument("-s", "--startup", required=False, action='store_true',
+            help="Measure startup (import) time for each entry point")
+        parser.add_argument("-E", "--engine", required=False, action='store_true',
+            help="Measure parse, prepare, tie-breaks and serialization on generated tournaments")
+        parser.add_argument("-T", "--type", required=False, nargs='*',
+            default=['swiss', 'rr', 'team'],
+            help="Tournament types: swiss rr team")
+        parser.add_argument("-N", "--players", type=int,
+            default=200,
+            help="Number of players, number of teams for team events")
+        parser.add_argument("-R", "--rounds", type=int,
+            default=9,
+            help="Number of rounds (swiss and team)")
+        parser.add_argument("-B", "--boards", type=int,
+            default=4,
+            help="Number of boards in team events")
+        parser.add_argument("-F", "--file-format", required=False, nargs='*',
+            default=['TRF', 'TS', 'JSON'],
+            help="File formats: TRF TS JSON")
+        parser.add_argument("-t", "--tie-break", required=False, nargs='*',
+            default=None,
+            help="Tie-breaks, default is a large set for player and team events")
+        parser.add_argument("-k", "--keep", required=False,
+            default=None,
+            help="Keep generated files in this directory")
+        parser.add_argument("--seed", type=int,
+            default=1,
+            help="Seed for tournament generator")
+        parser.add_argument("-r", "--repeat", type=int,
+            default=5,
+            help="Number of runs, median is reported")
+        parser.add_argument("-o", "--output-file", required=False,
+            default=None,
+            help="Write results to json file")
+        parser.add_argument("-b", "--baseline", required=False,
+            default=None,
+            help="Compare with results from a previous run")
+        self.params = vars(parser.parse_args())
+        return self.params
+
+    # entrypoints
+    # returns a list of [name, arguments, stdin] for the entry points
+
+    def entrypoints(self, trffile):
+        request = {
+            'filetype': 'tiebreak request',
+            'version': '1.0',
+            'origin': 'benchmark',
+            'published': self.results['published'],
+            'command': {
+                'service': 'tiebreak',
+                'filename': 'startup.trf',
+                'filetype': 'TRF',
+                'content': base64.b64encode(smalltrf.encode('latin1')).decode('ascii'),
+                'tournamentno': 1,
+                'norounds': '',
+                'tiebreaks': ['PTS', 'BH', 'SB'],
+                'tournamenttype': ''
+                }
+            }
+        return [
+            ['tiebreakchecker', ['-i', trffile, '-c', '-t', 'PTS', 'BH', 'SB'], None],
+            ['convert', ['-i', trffile, '-o', os.devnull], None],
+            ['chessserver', [], json.dumps(request)],
+            ['verifyjch', ['-i', trffile], None]
+            ]
+
+    # importtime
+    # run an entry point with -X importtime, return wall time (s),
+    # total import time (s) and cumulative import time per top level module (s)
+
+    def importtime(self, name, args, stdin):
+        cmd = [sys.executable, '-X', 'importtime', os.path.join(self.root, name + '.py')] + args
+        start = time.perf_counter()
+        proc = subprocess.run(cmd, input=stdin, capture_output=True, text=True, cwd=self.root)
+        wall = time.perf_counter() - start
+        modules = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            parts = line[12:].split('|')
+            if len(parts) != 3 or not parts[0].strip().isdigit():
+                continue
+            module = parts[2].rstrip()
+            if module[1:2] != ' ':    # top level module, nested imports are indented
+                modules[module.strip()] = int(parts[1]) / 1000000
+        return [wall, sum(modules.values()), modules]
+
+    def run_startup(self):
+        repeat = max(1, self.params['repeat'])
+        with tempfile.TemporaryDirectory() as tmp:
+            trffile = os.path.join(tmp, 'startup.trf')
+            with open(trffile, 'w', encoding='latin1') as f:
+                f.write(smalltrf)
+            for [name, args, stdin] in self.entrypoints(trffile):
+                self.importtime(name, args, stdin)   # warm up, compile pyc-files
+                runs = [self.importtime(name, args, stdin) for i in range(repeat)]
+                runs = sorted(runs, key=lambda run: run[1])
+                median = runs[len(runs)//2]
+                top = sorted(median[2].items(), key=lambda item: -item[1])[0:10]
+                self.results['startup'][name] = {
+                    'wall': round(sorted(run[0] for run in runs)[len(runs)//2], 6),
+                    'import': round(median[1], 6),
+                    'modules': {module: round(value, 6) for module, value in top}
+                    }
+
+    # engine_run
+    # parse text and compute tie-breaks once, return timing in seconds
+
+    def engine_run(self, fileformat, text, tiebreaks):
+        timing = {}
+        start = time.perf_counter()
+        match fileformat:
+            case 'TRF':
+                from trf2json import trf2json
+                chessfile = trf2json()
+                chessfile.parse_file(text, False)
+            case 'TS':
+                from ts2json import ts2json
+                chessfile = ts2json()
+                chessfile.parse_file(io.BytesIO(text.encode('utf-8')), False, 1)
+            case 'JSON':
+                from chessjson import chessjson
+                chessfile = chessjson()
+                chessfile.parse_file(text, False)
+        timing['parse'] = time.perf_counter() - start
+        params = {'tie_break': tiebreaks, 'is_rr': None, 'unrated': 0}
+        start = time.perf_counter()
+        tb = timedtiebreak(chessfile, 1, -1, params)
+        timing['tiebreak_init'] = time.perf_counter() - start
+        start = time.perf_counter()
+        tb.compute_tiebreaks(chessfile, 1, params)
+        timing['compute_tiebreaks'] = time.perf_counter() - start
+        start = time.perf_counter()
+        helpers.json_output(io.StringIO(), {'tiebreakResult': chessfile.result})
+        helpers.json_output(io.StringIO(), chessfile.chessjson)
+        timing['serialize'] = time.perf_counter() - start
+        timing['prepare_competitors'] = tb.timing['prepare_competitors']
+        timing['compute_score'] = tb.timing['compute_score']
+        timing['tiebreaks'] = tb.timing['tiebreaks']
+        return timing
+
+    def run_engine(self):
+        params = self.params
+        repeat = max(1, params['repeat'])
+        extension = {'TRF': '.trf', 'TS': '.trx', 'JSON': '.json'}
+        for ttype in params['type']:
+            tg = tournamentgenerator({
+                'type': ttype,
+                'players': params['players'],
+                'rounds': params['rounds'],
+                'teamsize': params['boards'],
+                'seed': params['seed']
+                }).generate()
+            tiebreaks = params['tie_break'] if params['tie_break'] != None else teamtiebreaks if tg.isteam else playertiebreaks
+            for fileformat in params['file_format']:
+                match fileformat:
+                    case 'TRF':
+                        text = tg.write_trf()
+                    case 'TS':
+                        text = tg.write_ts()
+                    case 'JSON':
+                        text = tg.write_json()
+                name = ttype + '-' + str(params['players']) + 'x' + str(tg.numrounds)
+                if params['keep'] != None:
+                    with open(os.path.join(params['keep'], name + extension[fileformat]), 'w', encoding='utf-8') as f:
+                        f.write(text)
+                runs = [self.engine_run(fileformat, text, tiebreaks) for i in range(repeat)]
+                result = {}
+                for key, value in runs[0].items():
+                    if key == 'tiebreaks':
+                        result[key] = {tb: round(statistics.median(run[key][tb] for run in runs), 6) for tb in value}
+                    else:
+                        result[key] = round(statistics.median(run[key] for run in runs), 6)
+                self.results['engine'][name + '-' + fileformat] = result
+
+    def print_results(self, baseline):
+        self.print_startup(baseline['startup'] if baseline != None and 'startup' in baseline else {})
+        self.print_engine(baseline['engine'] if baseline != None and 'engine' in baseline else {})
+
+    def change(self, value, base):
+        if base == None or base <= 0:
+            return ''
+        return '{0:+.0f}%'.format((value / base - 1) * 100)
+
+    def print_startup(self, base):
+        if len(self.results['startup']) == 0:
+            return
+        print('{0:16} {1:>10} {2:>10} {3:>8}'.format('entry point', 'import ms', 'wall ms', 'change'))
+        for name, value in self.results['startup'].items():
+            change = self.change(value['import'], base[name]['import'] if name in base else None)
+            print('{0:16} {1:10.1f} {2:10.1f} {3:>8}'.format(name, value['import']*1000, value['wall']*1000, change))
+            for module, mtime in value['modules'].items():
+                print('    {0:24} {1:8.1f}'.format(module, mtime*1000))
+
+    def print_engine(self, base):
+        for name, value in self.results['engine'].items():
+            old = base[name] if name in base else {}
+            print('{0:30} {1:>10} {2:>8}'.format(name, 'ms', 'change'))
+            for key, seconds in value.items():
+                if key == 'tiebreaks':
+                    oldtb = old[key] if key in old else {}
+                    for tb, tbseconds in seconds.items():
+                        print('    {0:26} {1:10.2f} {2:>8}'.format(tb, tbseconds*1000, self.change(tbseconds, oldtb[tb] if tb in oldtb else None)))
+                else:
+                    print('  {0:28} {1:10.2f} {2:>8}'.format(key, seconds*1000, self.change(seconds, old[key] if key in old else None)))
+
+    def main(self):
+        params = self.read_command_line()
+        baseline = None
+        if params['baseline'] != None:
+            with open(params['baseline'], 'r') as f:
+                baseline = json.load(f)
+        if params['startup']:
+            self.run_startup()
+        if params['engine']:
+            self.run_engine()
+        if params['output_file'] != None:
+            with open(params['output_file'], 'w') as f:
+                json.dump(self.results, f, indent=2)
+        self.print_results(baseline)
+        return 0
+
+
+# run program
+if __name__ == '__main__':
+    bm = benchmark()
+    sys.exit(bm.main())
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2024, Otto Milvang
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Created on Mon Oct 19 14:05:12 2026
+@author: Otto Milvang, sjakk@milvang.no
+"""
+
+"""
+Check many tournament files in one run
+
+    python bulkchecker.py -t PTS BH/C1 -o archive.jsonl -M archive.manifest archive/
+
+Input is a list of files, directories or glob patterns. Each file is checked
+with tiebreaklib in a process pool, and one JSON line is written per file:
+    {"file": ..., "hash": ..., "code": ..., "check": ..., "ranks": {cid: rank}, "time": ...}
+With -V, ranks is empty and "mismatch" holds the first wrong rank.
+code is the exit code of tiebreakchecker (0 = ranks correct, 1 = ranks differ, >= 400 error).
+
+With -M, the hash of each checked file (code 0 or 1) is appended to the manifest, and
+files found in the manifest are skipped in the next run. Files with errors are
+checked again. The hash covers
+the file content and the options, so a new tie-break list checks all files again.
+The output file is appended to when a manifest is used.
+"""
+
+import sys
+import os
+import glob
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+import helpers
+import tiebreaklib
+
+# options passed to tiebreaklib
+libparams = ['tournament_number', 'number_of_rounds', 'game_score', 'match_score', 'is_rr', 'unrated', 'verify', 'tie_break']
+
+
+class bulkchecker:
+
+    def __init__(self):
+        self.origin = 'bulkchecker ver. 1.00'
+        self.params = None
+
+    # read_command_line
+    #   options:
+    #   files = input files, directories or glob patterns
+    #   -o = output-file (JSON lines)
+    #   -M = manifest of completed files
+    #   -j = number of worker processes
+    #   -f = file-format, default from file extension
+    #   -e = event-number
+    #   -n = number-of-rounds
+    #   -p = use rules for tournament with pre-determined pairing (Round Robin)
+    #   -s = use rules for swiss tournament
+    #   -g = game-score
+    #   -m = match-score
+    #   -u = set rating for unrated players
+    #   -t = tie-break
+    #   -V = verify ranks only, stop at first mismatch
+
+    def read_command_line(self, args=None):
+        parser = argparse.ArgumentParser()
+        parser.add_argument("files", nargs='+',
+            help="Input files, directories or glob patterns")
+        parser.add_argument("-o", "--output-file", required=False, default='-',
+            help="path to output file, one json line per input file")
+        parser.add_argument("-M", "--manifest", required=False,
+            help="path to manifest of completed files, used to resume")
+        parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+            help="Number of worker processes")
+        parser.add_argument("-f", "--file-format", required=False,
+            help="TRF, JSON or TS, default from file extension")
+        parser.add_argument("-e", "--tournament-number", required=False, default='1',
+            help="tournament number")
+        parser.add_argument("-n", "--number-of-rounds", type=int, default=-1,
+            help="Nuber of rounds, overrides file value")
+        parser.add_argument("-p", "--pre-determined", required=False, action='store_true',
+            help="Use rules for tournament with pre-determined pairing")
+        parser.add_argument("-s", "--swiss", required=False, action='store_true',
+            help="Use rules for swiss tournament")
+        parser.add_argument("-g", "--game-score", required=False, nargs='*',
+            help="Point system for matches, default W:2.0,D:1.0,L:0.0,Z:0,P:1.0,U:1.0" )
+        parser.add_argument("-m", "--match-score", required=False, nargs='*',
+            help="Point system for games, default W:1.0,D:0.5,L:0.0,Z:0,P:1.0,U:0.5" )
+        parser.add_argument("-u", "--unrated", required=False, default=0,
+            help="rating for unrated players")
+        parser.add_argument("-V", "--verify", required=False, action='store_true',
+            help="Verify ranks only, stop at first mismatch")
+        parser.add_argument("-t", "--tie-break", required=False, nargs='*',
+            default=['PTS', 'BH/C2/p'],
+            help="List of rank order specifiers" )
+        self.params = params = vars(parser.parse_args(args))
+        params['is_rr'] = None
+        if params['pre_determined']:
+            params['is_rr'] = True
+        if params['swiss']:
+            params['is_rr'] = False
+        return params
+
+    # find_files
+    #   expand directories and glob patterns, each file once in sorted order
+
+    def find_files(self, names):
+        files = []
+        for name in names:
+            if os.path.isdir(name):
+                for root, dirs, filenames in os.walk(name):
+                    dirs.sort()
+                    files += [os.path.join(root, filename) for filename in sorted(filenames)]
+            elif os.path.exists(name):
+                files.append(name)
+            else:
+                files += sorted(glob.glob(name, recursive=True))
+        return list(dict.fromkeys(files))
+
+    # read_manifest
+    #   the set of hashes of completed files
+
+    def read_manifest(self, filename):
+        done = set()
+        if filename != None and os.path.exists(filename):
+            with open(filename, 'r') as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) > 0:
+                        done.add(fields[0])
+        return done
+
+    # file_hash
+    #   sha256 of the options and the file content
+
+    def file_hash(self, filename):
+        options = json.dumps([self.params['file_format']] + [self.params[key] for key in libparams])
+        h = hashlib.sha256(options.encode('utf-8'))
+        with open(filename, 'rb') as f:
+            h.update(f.read())
+        return h.hexdigest()
+
+    def run(self):
+        params = self.params
+        done = self.read_manifest(params['manifest'])
+        jobs = []
+        skipped = 0
+        for filename in self.find_files(params['files']):
+            digest = self.file_hash(filename)
+            if digest in done:
+                skipped += 1
+            else:
+                jobs.append((filename, digest, params))
+        mode = 'a' if params['manifest'] != None else 'w'
+        f = sys.stdout if params['output_file'] == '-' else open(params['output_file'], mode)
+        manifest = open(params['manifest'], 'a') if params['manifest'] != None else None
+        counts = {}
+        now = time.time()
+        workers = max(1, min(params['jobs'], len(jobs)))
+        with multiprocessing.Pool(workers) as pool:
+            for record in pool.imap_unordered(check_file, jobs, chunksize=4):
+                f.write(json.dumps(record) + '\n')
+                f.flush()
+                # files with errors are not in the manifest and are checked again in the next run
+                if manifest != None and record['code'] in (0, 1):
+                    manifest.write(record['hash'] + '  ' + record['file'] + '\n')
+                    manifest.flush()
+                key = 'ok' if record['code'] == 0 else 'wrong' if record['code'] == 1 else 'error'
+                counts[key] = counts.get(key, 0) + 1
+        if manifest != None:
+            manifest.close()
+        if f != sys.stdout:
+            f.close()
+        summary = ', '.join([key + '=' + str(counts.get(key, 0)) for key in ['ok', 'wrong', 'error']])
+        sys.stderr.write(self.origin + ': ' + str(len(jobs)) + ' files, ' + str(skipped) + ' skipped, '
+                         + summary + ', ' + '{:.1f}'.format(time.time() - now) + ' s\n')
+        return 0 if counts.get('wrong', 0) + counts.get('error', 0) == 0 else 1
+
+
+# check_file
+#   worker, check one file and return the json line as a dict
+
+def check_file(job):
+    (filename, digest, params) = job
+    now = time.perf_counter()
+    record = {'file': filename, 'hash': digest}
+    fileformat = params['file_format']
+    if fileformat == None:
+        fileformat = helpers.getFileFormat(filename)
+    try:
+        with open(filename, 'rb') as f:
+            data = f.read()
+        libargs = {key: params[key] for key in libparams}
+        libargs['input_file'] = filename
+        output = tiebreaklib.compute(data, fileformat, **libargs)
+        status = output['status']
+        code = status['code'] if 'code' in status else 500
+        result = output['tiebreakResult'] if 'tiebreakResult' in output else None
+        check = result['check'] if result != None and 'check' in result else False
+        if code == 0:
+            code = 0 if check else 1
+        record['code'] = code
+        record['check'] = check
+        record['ranks'] = {str(cmp['cid']): cmp['rank'] for cmp in result['competitors']} if result != None and 'competitors' in result else {}
+        if result != None and 'mismatch' in result:
+            record['mismatch'] = result['mismatch']
+        if code >= 400:
+            record['error'] = status['error']
+    except Exception as err:
+        record['code'] = 500
+        record['check'] = False
+        record['ranks'] = {}
+        record['error'] = [str(err)]
+    record['time'] = round(time.perf_counter() - now, 4)
+    return record
+
+
+# run program
+#   the process pool imports this module in the workers, so only run as main program
+
+if __name__ == '__main__':
+    bulk = bulkchecker()
+    bulk.read_command_line()
+    code = bulk.run()
+    sys.exit(code)
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2024, Otto Milvang
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Created on Mon Oct 19 20:12:45 2026
+@author: Otto Milvang, sjakk@milvang.no
+"""
+
+"""
+Server-push standings for events registered in chessserver
+
+    python chessdaemon.py -P 8090
+
+Request:
+    GET /standings?eventid=<event id>&tournamentno=1&tiebreaks=PTS,BH/C1&tournamenttype=s&norounds=
+
+The response is a text/event-stream (Server-Sent Events). A message is sent when
+the client connects and each time a new version of the event file is submitted to chessserver:
+    id: <resultVersion>
+    event: standings
+    data: {"eventId": ..., "tournamentNo": ..., "resultVersion": ..., "status": {...}, "tiebreakResult": {...}}
+
+All clients with the same event, tournament and parameters share one computation
+and one message text. The event files are read from the event registry
+(tiebreakservice.eventregistry, same TIEBREAK_SPOOL as chessserver) and checked every --interval seconds.
+A client that reconnects with the header Last-Event-ID equal to the current version gets no repeated message.
+
+    GET /metrics
+returns the service metrics (tiebreakservice.metrics) in Prometheus text format,
+with the current queue and stream gauges.
+"""
+
+import sys
+import os
+import json
+import asyncio
+import argparse
+import urllib.parse
+import helpers
+import tiebreaklib
+import tiebreakservice
+from commonmain import commonmain
+
+
+class standings:
+
+    # One subscription, an event, a tournament and the tie-break parameters.
+    # The last message is kept, and changed is set when a new message is published.
+
+    def __init__(self, event, params):
+        self.event = event
+        self.params = params
+        self.subscribers = 0
+        self.mtime = None
+        self.version = None
+        self.message = None
+        self.running = False
+        self.changed = asyncio.Event()
+
+    def publish(self, version, message):
+        self.version = version
+        self.message = message
+        changed = self.changed
+        self.changed = asyncio.Event()
+        changed.set()
+
+
+class chessdaemon:
+
+    def __init__(self):
+        self.origin = 'chessdaemon ver. 1.00'
+        self.params = None
+        self.registry = None
+        self.groups = {}
+
+    # read_command_line
+    #   options:
+    #   -H = host
+    #   -P = port
+    #   -i = interval between checks of the event files
+    #   -k = keep-alive interval
+
+    def read_command_line(self, args=None):
+        parser = argparse.ArgumentParser()
+        parser.add_argument("-H", "--host", required=False, default='127.0.0.1',
+            help="Host address to listen on")
+        parser.add_argument("-P", "--port", type=int, default=8090,
+            help="Port to listen on")
+        parser.add_argument("-i", "--interval", type=float, default=1.0,
+            help="Seconds between checks of the event files")
+        parser.add_argument("-k", "--keepalive", type=float, default=15.0,
+            help="Seconds between keep-alive comments on idle streams")
+        self.params = vars(parser.parse_args(args))
+        return self.params
+
+    async def serve(self):
+        self.registry = tiebreakservice.eventregistry()
+        server = await asyncio.start_server(self.handle, self.params['host'], self.params['port'])
+        watcher = asyncio.create_task(self.watch())
+        sys.stderr.write(self.origin + ': listening on ' + self.params['host'] + ':' + str(self.params['port']) + '\n')
+        async with server:
+            await server.serve_forever()
+        watcher.cancel()
+
+    # watch
+    #   check the event files of all subscriptions, a changed file is computed once for all subscribers
+
+    async def watch(self):
+        while True:
+            for group in list(self.groups.values()):
+                self.refresh(group)
+            await asyncio.sleep(self.params['interval'])
+
+    def refresh(self, group):
+        if group.running:
+            return
+        try:
+            mtime = os.stat(self.registry.filename(group.event)).st_mtime_ns
+        except OSError:
+            return
+        if mtime == group.mtime:
+            return
+        group.mtime = mtime
+        group.running = True
+        asyncio.create_task(self.compute(group))
+
+    async def compute(self, group):
+        try:
+            data = self.registry.load(group.event)
+            if data != None:
+                version = tiebreakservice.request_key(dict(group.params, data=data))
+                if version != group.version:
+                    loop = asyncio.get_running_loop()
+                    message = await loop.run_in_executor(None, self.compute_message, group, data, version)
+                    group.publish(version, message)
+        except Exception as err:
+            sys.stderr.write(self.origin + ': event ' + group.event + ': ' + repr(err) + '\n')
+        finally:
+            group.running = False
+
+    # compute_message
+    #   runs in a worker thread, returns the message as bytes
+
+    def compute_message(self, group, data, version):
+        output = tiebreaklib.tiebreaklib(dict(group.params, data=data)).run()
+        message = {
+            'eventId': group.event,
+            'tournamentNo': helpers.parse_int(group.params['tournament_number']),
+            'resultVersion': version,
+            'status': output['status'],
+            'tiebreakResult': output['tiebreakResult'] if 'tiebreakResult' in output else None
+            }
+        text = json.dumps(message, default=helpers.decimal_serializer, separators=(',', ':'))
+        return ('id: ' + version + '\nevent: standings\ndata: ' + text + '\n\n').encode('utf-8')
+
+    # request_params
+    #   the query string as a chessserver command for the event, the params are built by commonmain.server_params,
+    #   so the standings and the resultVersion are the same as in a chessserver response for the event
+
+    def request_params(self, event, query):
+        command = {
+            'service': 'tiebreak',
+            'eventid': event,
+            'tournamentno': helpers.parse_int(query.get('tournamentno', '1')),
+            'norounds': query.get('norounds', ''),
+            'tiebreaks': query['tiebreaks'].split(',') if 'tiebreaks' in query else ['PTS', 'BH/C2/p'],
+            'tournamenttype': query.get('tournamenttype', '')
+            }
+        params = commonmain().server_params(command)
+        del params['data']
+        return params
+
+    def subscribe(self, event, params):
+        key = json.dumps([event, params], sort_keys=True)
+        if not key in self.groups:
+            self.groups[key] = standings(event, params)
+            self.refresh(self.groups[key])
+        group = self.groups[key]
+        group.subscribers += 1
+        return (key, group)
+
+    def unsubscribe(self, key, group):
+        group.subscribers -= 1
+        if group.subscribers == 0 and self.groups.get(key) is group:
+            del self.groups[key]
+
+    # handle
+    #   one client connection
+
+    async def handle(self, reader, writer):
+        try:
+            request = (await reader.readline()).decode('latin1').split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in [b'\r\n', b'\n', b'']:
+                    break
+                (name, sep, value) = line.decode('latin1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            url = urllib.parse.urlsplit(request[1]) if len(request) >= 2 else None
+            if url != None and request[0] == 'GET' and url.path == '/metrics':
+                await self.reply(writer, '200 OK', self.metrics_text(), 'text/plain; version=0.0.4; charset=utf-8')
+                return
+            if url == None or request[0] != 'GET' or url.path != '/standings':
+                await self.reply(writer, '404 Not Found', 'Unknown request')
+                return
+            query = dict(urllib.parse.parse_qsl(url.query))
+            event = query.get('eventid', '')
+            if not self.registry.valid(event) or not os.path.exists(self.registry.filename(event)):
+                await self.reply(writer, '404 Not Found', 'Unknown event: ' + event)
+                return
+            try:
+                params = self.request_params(event, query)
+            except ValueError:
+                await self.reply(writer, '400 Bad Request', 'Invalid parameter')
+                return
+            (key, group) = self.subscribe(event, params)
+            try:
+                await self.stream(writer, group, headers.get('last-event-id', None))
+            finally:
+                self.unsubscribe(key, group)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def reply(self, writer, status, text, content_type='text/plain; charset=utf-8'):
+        body = text.encode('utf-8')
+        writer.write(('HTTP/1.1 ' + status + '\r\nContent-Type: ' + content_type + '\r\nContent-Length: '
+                      + str(len(body)) + '\r\nConnection: close\r\n\r\n').encode('latin1') + body)
+        await writer.drain()
+
+    # metrics_text
+    #   counters from chessserver, gauges from the queue and the streams of this daemon
+
+    def metrics_text(self):
+        queue = tiebreakservice.workqueue()
+        state = queue.state()
+        metrics = tiebreakservice.metrics()
+        return metrics.render(metrics.load(), [
+            ('tiebreak_queue_waiting', {}, state['waiting']),
+            ('tiebreak_workers_busy', {}, state['running']),
+            ('tiebreak_workers', {}, queue.workers),
+            ('tiebreak_stream_groups', {}, len(self.groups)),
+            ('tiebreak_stream_subscribers', {}, sum([group.subscribers for group in self.groups.values()]))
+            ])
+
+    # stream
+    #   send the current message and each new one, and a comment when idle
+
+    async def stream(self, writer, group, version):
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n'
+                     + b'Connection: keep-alive\r\nAccess-Control-Allow-Origin: *\r\n\r\n')
+        await writer.drain()
+        while True:
+            if group.message != None and group.version != version:
+                version = group.version
+                writer.write(group.message)
+                await writer.drain()
+            changed = group.changed
+            try:
+                await asyncio.wait_for(changed.wait(), self.params['keepalive'])
+            except asyncio.TimeoutError:
+                writer.write(b': keep-alive\n\n')
+                await writer.drain()
+
+
+# run program
+
+if __name__ == '__main__':
+    daemon = chessdaemon()
+    daemon.read_command_line()
+    try:
+        asyncio.run(daemon.serve())
+    except KeyboardInterrupt:
+        pass
+    sys.exit(0)
@@ -11,10 +11,17 @@ Created on Wed Nov  1 11:01:49 2023
 import sys
 import random
 import json
+import re
 import helpers
 import time
 from decimal import *
 
+# key for result of a color 
+resultkey = {'white': 'wResult', 'black': 'bResult'}
+
+# white space in json text, and a decoder without Decimal
+jsonspace = re.compile(r'[ \t\n\r]*')
+jsondecoder = json.JSONDecoder()
 
 class chessjson:
 
@@ -22,7 +29,7 @@ class chessjson:
     
    # constructor function    
     def __init__(self):
-        random.seed(a=None, version=2)
+        self.random = random.Random()   # each instance has its own generator
         self.chessjson = {
 	    'filetype': 'Event',
 	    'version': '1.0',
@@ -48,6 +55,7 @@ class chessjson:
             'rating' : {'W': Decimal('1.0'), 'D': Decimal('0.5'), 'L': Decimal('0.0'), 'Z': Decimal('0.0'), 'A': 'Z', 'U': 'Z' },
             '_reverse': {'W': 'L', 'D': 'D', 'L': 'W', 'Z': 'W', 'A': 'A', 'U': 'U' }
            }
+        self.scoretables = {}
         self.numProfiles = 0
         self.numTeams = 0
         self.numResults = 0
@@ -74,10 +82,21 @@ class chessjson:
 
 
     def get_tournament(self, tournamentno):
-        for tournament in self.event['tournaments']: 
-            if tournament['tournamentNo'] == tournamentno:
-                return tournament
-        return None
+        tnos = self.all_tnos()
+        return tnos[tournamentno] if tournamentno in tnos else None
+
+    # all_tnos
+    # index tournamentNo -> tournament, rebuilt when the tournament list is replaced or changes length  
+
+    def all_tnos(self):
+        tournaments = self.event['tournaments']
+        if not hasattr(self, 'tnos') or self.tnolist is not tournaments or len(tournaments) != self.tnolen:
+            self.tnos = {}
+            for tournament in tournaments:
+                self.tnos.setdefault(tournament['tournamentNo'], tournament)
+            self.tnolist = tournaments
+            self.tnolen = len(tournaments)
+        return self.tnos
 
     def get_scoresystem(self, scoreLists, name):
         for scoreList in scoreLists: 
@@ -99,15 +118,127 @@ class chessjson:
                 param = param.replace('=', ':')
                 args = param.split(':')
                 scoresystem[args[0]] = float(args[1])
+            self.clear_scoretables()
         except:
             self.put_status(402, "Error in score system, " + str(txt))        
    
     
-    def parse_file(self, lines, verbose):
+    def parse_file(self, lines, verbose, tournamentno=0):
         now = time.time()
-        self.chessjson = json.loads(lines)
+        if tournamentno > 0:
+            self.chessjson = self.parse_selected(lines, tournamentno)
+        else:
+            self.chessjson = json.loads(lines, parse_float=Decimal)
+        if not 'status' in self.chessjson:
+            self.chessjson['status'] = {'code': 0, 'error': []}
+        self.event = self.chessjson['event']
 
 
+    # parse_selected
+    # Read only tournament tournamentno from the json text. 
+    # The tournaments are decoded one by one and only the selected one is kept, 
+    # so the other tournaments are never in memory at the same time. 
+    # Profiles and teams are kept only if the tournament refers to them.
+
+    def parse_selected(self, text, tournamentno):
+        decoder = json.JSONDecoder(parse_float=Decimal)
+        top = {}
+        event = {}
+        tournaments = []
+        elements = {'profiles': {}, 'teams': {}}    # id -> element
+        
+        # element in profiles or teams, save by id
+        def element(section):
+            def member(index, pos):
+                (elem, end) = decoder.raw_decode(text, pos)
+                if isinstance(elem, dict) and 'id' in elem:
+                    elements[section].setdefault(elem['id'], (index, elem))
+                return end
+            return member
+        
+        # element in tournaments, keep if tournamentNo is correct
+        # floats are not converted to Decimal before the tournament is selected
+        def tournament(index, pos):
+            (elem, end) = jsondecoder.raw_decode(text, pos)
+            if isinstance(elem, dict) and elem.get('tournamentNo') == tournamentno:
+                tournaments.append(decoder.raw_decode(text, pos)[0])
+            return end
+        
+        def eventmember(key, pos):
+            match key:
+                case 'tournaments':
+                    return self.json_members(text, pos, '[', tournament)
+                case 'profiles' | 'teams':
+                    event[key] = []
+                    return self.json_members(text, pos, '[', element(key))
+            (event[key], end) = decoder.raw_decode(text, pos)
+            return end
+
+        def topmember(key, pos):
+            if key == 'event':
+                return self.json_members(text, pos, '{', eventmember)
+            (top[key], end) = decoder.raw_decode(text, pos)
+            return end
+        
+        end = self.json_members(text, jsonspace.match(text, 0).end(), '{', topmember)
+        if jsonspace.match(text, end).end() != len(text):
+            raise ValueError('Extra data after json document')
+
+        # profiles and teams referred by the tournament, in file order
+        pids = []
+        tids = []
+        for tm in tournaments:
+            for competitor in tm['competitors']:
+                for cmp in [competitor] + (competitor['cplayers'] if 'cplayers' in competitor else []):
+                    if 'profileId' in cmp:
+                        pids.append(cmp['profileId'])
+                    if 'teamId' in cmp:
+                        tids.append(cmp['teamId'])
+        for section, ids in [('teams', tids), ('profiles', pids)]:
+            if not section in event:
+                continue
+            for pid in dict.fromkeys(ids):
+                if pid in elements[section]:
+                    elem = elements[section][pid][1]
+                    event[section].append(elem)
+                    if section == 'teams':
+                        pids.extend(elem['players'] if 'players' in elem else [])
+            event[section].sort(key=lambda elem: elements[section][elem['id']][0])
+        event['tournaments'] = tournaments
+        top['event'] = event
+        return top
+
+    # json_members
+    # Walk through an object ('{') or array ('[') at pos in text
+    # handler(key, pos) for objects and handler(index, pos) for arrays must return the end of the value   
+    # returns end of the object / array
+
+    def json_members(self, text, pos, bracket, handler):
+        close = '}' if bracket == '{' else ']'
+        if text[pos] != bracket:
+            raise ValueError('Expected ' + bracket + ' at position ' + str(pos))
+        pos = jsonspace.match(text, pos + 1).end()
+        if text[pos] == close:
+            return pos + 1
+        index = 0
+        while True:
+            if bracket == '{':
+                (key, pos) = json.decoder.scanstring(text, pos + 1)
+                pos = jsonspace.match(text, pos).end()
+                if text[pos] != ':':
+                    raise ValueError('Expected : at position ' + str(pos))
+                pos = jsonspace.match(text, pos + 1).end()
+            else:
+                key = index
+            pos = jsonspace.match(text, handler(key, pos)).end()
+            index += 1
+            if text[pos] == ',':
+                pos = jsonspace.match(text, pos + 1).end()
+            elif text[pos] == close:
+                return pos + 1
+            else:
+                raise ValueError('Expected , or ' + close + ' at position ' + str(pos))
+
     def tournament_getvalue(self, tournamentno, key):
         tournament = self.get_tournament(tournamentno)
         if tournament == None:
@@ -167,9 +298,15 @@ class chessjson:
     # check if a result exist in the result list.
     # if True: Update the result object with the new result and return the ID
     # if False: Add the result to the result list
+    # index is an optional dict (round, white) -> result for the result list, 
+    # it replaces the search in the list and is updated when a result is added
 
-    def append_result(self, results, result):
-        gamelist = list(filter(lambda elem: elem['round'] == result['round'] and elem['white'] == result['white'], results))
+    def append_result(self, results, result, index=None):
+        if index == None:
+            gamelist = list(filter(lambda elem: elem['round'] == result['round'] and elem['white'] == result['white'], results))
+        else:
+            key = (result['round'], result['white'])
+            gamelist = [index[key]] if key in index else []
         if len(gamelist) > 0:
             elem = gamelist[0]
             if not('wResult' in elem) and ('wResult' in result):
@@ -186,6 +323,8 @@ class chessjson:
         #if (result['white'] == trace or result['black'] == trace):
         #    print('First', result)
         results.append(result)
+        if index != None:
+            index[(result['round'], result['white'])] = result
         return rid 
 
     def update_results(self, results):
@@ -217,6 +356,83 @@ class chessjson:
     def next_game(self):
         self.numResults += 1
         return self.numResults
+
+    # apply_results
+    # Round-delta for a tournament, used by the event registry in chessserver
+    # delta['gameList'] and delta['matchList'] are games in Chess-JSON format,
+    # a game replaces all games in the same round with one of its competitors.
+    # A game without played is played when it has two competitors.
+    # delta['competitors'] updates the fields of the competitors with the same cid.
+
+    def apply_results(self, tournamentno, delta):
+        tournament = self.get_tournament(tournamentno)
+        for key in ['gameList', 'matchList']:
+            if not key in delta:
+                continue
+            games = tournament.setdefault(key, [])
+            index = {}
+            for game in games:
+                for cid in [game['white'], game['black']]:
+                    if cid > 0:
+                        index[(game['round'], cid)] = game
+            replaced = set()
+            gid = max([game['id'] for game in games if 'id' in game], default=0)
+            for game in delta[key]:
+                for cid in [game['white'], game['black']]:
+                    if (game['round'], cid) in index:
+                        replaced.add(id(index[(game['round'], cid)]))
+                if not 'id' in game:
+                    gid += 1
+                    game['id'] = gid
+                if not 'played' in game:
+                    game['played'] = game['white'] > 0 and game['black'] > 0
+            games[:] = [game for game in games if not id(game) in replaced] + delta[key]
+            lastround = max([game['round'] for game in games], default=0)
+            if lastround > tournament['numRounds']:
+                tournament['numRounds'] = lastround
+            if lastround > tournament.get('currentRound', 0):
+                tournament['currentRound'] = lastround
+        if 'competitors' in delta:
+            cids = {competitor['cid']: competitor for competitor in tournament['competitors']}
+            for competitor in delta['competitors']:
+                if competitor['cid'] in cids:
+                    cids[competitor['cid']].update(competitor)
+
+    # delta_error
+    # check a round-delta before apply_results, returns an error text or None
+
+    def delta_error(self, delta):
+        isint = lambda value: isinstance(value, int) and not isinstance(value, bool)
+        for key in ['gameList', 'matchList']:
+            if not key in delta:
+                continue
+            if not isinstance(delta[key], list):
+                return key + ' is not a list'
+            for (n, game) in enumerate(delta[key]):
+                if not isinstance(game, dict):
+                    return key + '[' + str(n) + '] is not an object'
+                for (field, least) in [('round', 1), ('white', 0), ('black', 0)]:
+                    if not field in game:
+                        return key + '[' + str(n) + '] has no ' + field
+                    if not isint(game[field]) or game[field] < least:
+                        return key + '[' + str(n) + '].' + field + ' is not an integer >= ' + str(least)
+                if 'id' in game and not isint(game['id']):
+                    return key + '[' + str(n) + '].id is not an integer'
+                if not 'wResult' in game and not 'bResult' in game:
+                    return key + '[' + str(n) + '] has no wResult or bResult'
+                for field in ['wResult', 'bResult']:
+                    if field in game and not isinstance(game[field], str):
+                        return key + '[' + str(n) + '].' + field + ' is not a string'
+                for field in ['played', 'rated']:
+                    if field in game and not isinstance(game[field], bool):
+                        return key + '[' + str(n) + '].' + field + ' is not true or false'
+        if 'competitors' in delta:
+            if not isinstance(delta['competitors'], list):
+                return 'competitors is not a list'
+            for (n, competitor) in enumerate(delta['competitors']):
+                if not isinstance(competitor, dict) or not 'cid' in competitor or not isint(competitor['cid']):
+                    return 'competitors[' + str(n) + '] has no integer cid'
+        return None
     
     
 # ==============================
@@ -276,21 +492,66 @@ class chessjson:
 
 
     def get_score(self, name, result, color):
-        scoreSystem = self.scoreLists[name] if name in self.scoreLists else self.get_scoresystem(self.event['scoreLists'], name)
-        
-        reverse = self.scoreLists['_reverse']
-        if color[0] + 'Result' in result:
-            res = result[color[0] + 'Result']
+        key = resultkey[color]
+        if key in result:
+            res = result[key]
         elif result['black'] > 0:
-            res = reverse[result[color[0] + 'Result']]
+            reverse = self.scoreLists['_reverse']
+            res = reverse[result[key]]
         else:     
             return 0.0
+        try:
+            table = self.scoretables[name][result['played'] != False]
+        except KeyError:
+            tables = self.scoretables[name] if name in self.scoretables else self.compile_scoretable(name)
+            table = tables[result.get('played', True) != False]
+        if res in table:
+            return table[res]
+        return self.resolve_score(name, res, result.get('played', True))
+
+    # resolve_score
+    # follow the chain of indirections in a score system, 'A' -> 'D' -> 0.5
+
+    def resolve_score(self, name, res, played):
+        scoreSystem = self.scoreLists[name] if name in self.scoreLists else self.get_scoresystem(self.event['scoreLists'], name)
         while res in scoreSystem:
-            if res == 'L' and result['played'] == False:
+            if res == 'L' and played == False:
                 res = 'Z'
             res = scoreSystem[res]
         return res
 
+    # compile_scoretable
+    # Score systems are compiled to two lookup tables, [unplayed, played],
+    # from result code to points. Codes with a broken or circular chain are
+    # left out and resolved by resolve_score.
+    
+    def compile_scoretable(self, name):
+        scoreSystem = self.scoreLists[name] if name in self.scoreLists else self.get_scoresystem(self.event['scoreLists'], name)
+        tables = [{}, {}]
+        for played in [False, True]:
+            for code in scoreSystem:
+                res = code
+                steps = 0
+                broken = False
+                while res in scoreSystem and steps <= len(scoreSystem):
+                    if res == 'L' and played == False:
+                        res = 'Z'
+                        if not res in scoreSystem:
+                            broken = True
+                            break
+                    res = scoreSystem[res]
+                    steps += 1
+                if not broken and not res in scoreSystem:
+                    tables[played][code] = res
+        self.scoretables[name] = tables
+        return tables
+
+    # clear_scoretables
+    # must be called when a score system is changed
+
+    def clear_scoretables(self):
+        self.scoretables = {}
+
     def is_vur(self, result, color):  #
         reverse = self.scoreLists['_reverse']
         if result['played']:
@@ -350,7 +611,7 @@ class chessjson:
         competitors = tournament['competitors']
         for competitor in competitors:
             if not 'random' in competitor:
-                competitor['random'] = random.random()
+                competitor['random'] = self.random.random()
                 update = True
         if update:
             ro = sorted(competitors, key=lambda p: (p['random'], p['cid']))
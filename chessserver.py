@@ -10,16 +10,19 @@ THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR I
 Created on Mon Oct 25 08:16:13 2024
 @author: Otto Milvang, sjakk@milvang.no
 """
-import argparse
+import os
 import json
 import io
 import sys
+import gzip
+import zlib
+import hashlib
+import time
 import datetime
 import codecs
 import helpers
+import tiebreakservice
 from commonmain import commonmain
-from chessjson import chessjson
-from tiebreak import tiebreak
 
 # ==============================
 """
@@ -34,16 +37,63 @@ Request:
         "filename" : "<original file name>",
         "filetype": "TRF" | "TS" | < other known format >,
         "content": ["<lines with base 64 encoded file>"],
+        "encoding": "gzip" | "deflate",   // optional, content is compressed
+        "resultversion": "<resultVersion of a previous response>",   // optional
+        "baseversion": "<resultVersion of a previous response>",   // optional, changed competitors only
+        "priority": "interactive" | "batch",   // optional, default interactive
         "tournamentno": <0 or tournamentno to convert>,
         "number_of_rounds": <int>, 
         // parameters for tiebreaks
             "tiebreaks" : [string list],
             "tournamenttype" : "" | "d" | "p" | "s"
+        // round-delta upload, optional
+            "eventid": "" | "<event id>",
+            "gameList": [<games in Chess-JSON format>],
+            "matchList": [<matches in Chess-JSON format>],
+            "competitors": [{"cid": <cid>, <fields to update>}]
         }
    
     }
 }
 
+Round-delta upload:
+    eventid "" with content registers the file as a new event, 
+    eventid with content replaces the file of the event,
+    eventid without content applies gameList, matchList and competitors 
+    to the tournament tournamentno in the stored file. 
+    Games need round, white, black and wResult or bResult, competitors need cid, 
+    an invalid round-delta gets status code 501.
+    The response has "eventId": "<event id>"
+
+The response is gzip compressed if the request has the header Accept-Encoding: gzip
+
+Result version:
+    The response has "resultVersion" and the header ETag, a hash of the content and the parameters.
+    If the request has resultversion or the header If-None-Match with the current version,
+    the result is not computed. The response is status code 304 and no tiebreakResult,
+    or HTTP 304 with no body for If-None-Match.
+
+Queue:
+    A computation waits for a worker slot (tiebreakservice.workqueue), interactive requests before batch requests.
+    A newer request for the same event or file, tournament and tie-breaks with another content 
+    cancels the older one, the older one and the requests waiting for its result get status code 409.
+    A client with too many waiting or running requests gets status code 429.
+
+Change response:
+    If the request has baseversion, competitors lists only the competitors 
+    with a new rank or tiebreakScore since that version, and the response has "baseVersion". 
+    If the base version is unknown or expired (2 days), the response has all competitors and no baseVersion.
+
+Metrics:
+    Each request adds its counters and stage timings to tiebreakservice.metrics, 
+    the Prometheus text file is TIEBREAK_METRICS_FILE (default <spool>/metrics/tiebreak.prom)
+    for the textfile collector of node_exporter. chessdaemon serves the same metrics on /metrics.
+
+Slow requests:
+    A request over TIEBREAK_SLOW_SECONDS or TIEBREAK_SLOW_MEMORY is recorded by tiebreakservice.slowlog 
+    with its parameters, content hash and stage timings, and with TIEBREAK_SLOW_INPUT=1 the decoded input file.
+    The record has the tiebreakchecker command line to replay the computation.
+
 Response:
 {
     "filetype": "convert response" | "tiebreak response",
@@ -73,12 +123,20 @@ Response:
 """
 
 
+# HTTP status text of the service errors
+httpstatus = {409: 'Conflict', 429: 'Too Many Requests', 501: 'Not Implemented'}
+
+
 class chessserver(commonmain):
 
     def __init__(self):
         super().__init__()
         self.origin = 'chessserver ver. 1.00'
         self.tournamentno = 0
+        self.status = 0
+        self.source = None
+        self.request_format = ''
+        self.arrival = 0
 
     def read_command_line(self):
         self.read_common_server(True)
@@ -94,6 +152,7 @@ class chessserver(commonmain):
             case 'convert':
                self.core = None
             case 'tiebreak':
+                from tiebreak import tiebreak
                 result = None
                 if params['check']:
                     self.filetype = 'tiebreak'
@@ -108,6 +167,270 @@ class chessserver(commonmain):
             case _:
                 self.core = None
 
+    # common_main
+    #   Concurrent requests with the same content and parameters share one computation, 
+    #   see tiebreakservice.fileflight.
+    #   The request key is the version of the result, a client that already has 
+    #   this version gets a "not modified" response and nothing is computed.
+
+    def common_main(self):
+        start = time.perf_counter()
+        try:
+            return self.serve_request()
+        except Exception:
+            # an unreadable file has status 401 in the chess file, other failures are counted as 500
+            chessfile = getattr(self, 'chessfile', None)
+            code = chessfile.get_status() if chessfile != None else 0
+            self.status = code if code >= 400 else 500
+            raise
+        finally:
+            self.timings['total'] = time.perf_counter() - start
+            self.record_metrics()
+            self.record_slow()
+
+    def serve_request(self):
+        self.arrival = time.time_ns()
+        start = time.perf_counter()
+        self.read_command_line()
+        self.request_format = self.params['file_format']
+        self.decode_content()
+        if 'event_id' in self.params:
+            self.update_event()
+        self.timings['read'] = time.perf_counter() - start
+        version = self.params['result_version'] = tiebreakservice.request_key(self.params)
+        etags = tiebreakservice.etags(os.environ.get('HTTP_IF_NONE_MATCH', ''))
+        if version in etags:
+            self.source = 'not_modified'
+            sys.stdout.write('Status: 304 Not Modified\r\nETag: "' + version + '"\r\n\r\n')
+            return 0
+        if self.params['known_version'] == version:
+            self.source = 'not_modified'
+            self.write_response(helpers.json_string(self.not_modified()), version)
+            return 0
+        flight = tiebreakservice.fileflight()
+        try:
+            text = flight.run(version, self.compute_response)
+        except tiebreakservice.serviceerror as err:
+            self.status = err.code
+            self.write_response(helpers.json_string(self.error_output(err.code, err.text)), version, err.code)
+            return err.code
+        self.source = 'coalesced' if flight.coalesced else 'computed'
+        if self.params['base_version'] != None:
+            text = self.change_response(text)
+        self.write_response(text, version)
+        return 0
+
+    def error(self, code, txt):
+        self.status = code
+        super().error(code, txt)
+
+    # record_metrics
+    #   counters and stage timings of this request, see tiebreakservice.metrics.
+    #   Metrics are not allowed to make the request fail.
+
+    def record_metrics(self):
+        params = self.params if self.params != None else {}
+        counters = [('tiebreak_requests_total', {'service': params.get('service', ''), 'format': self.request_format}, 1)]
+        if self.source != None:
+            counters.append(('tiebreak_responses_total', {'source': self.source}, 1))
+        if self.status >= 400:
+            counters.append(('tiebreak_errors_total', {'code': self.status}, 1))
+        worker = sum([self.timings[stage] for stage in ['parse', 'compute', 'output'] if stage in self.timings])
+        if worker > 0:
+            counters.append(('tiebreak_worker_seconds_total', {}, worker))
+        try:
+            queue = tiebreakservice.workqueue()
+            state = queue.state()
+            gauges = [
+                ('tiebreak_queue_waiting', {}, state['waiting']),
+                ('tiebreak_workers_busy', {}, state['running']),
+                ('tiebreak_workers', {}, queue.workers)
+                ]
+            tiebreakservice.metrics().observe(counters, self.timings, gauges)
+        except (OSError, ValueError):
+            pass
+
+    # record_slow
+    #   a request over the latency or memory limit is recorded for replay, see tiebreakservice.slowlog.
+    #   Requests that only waited for another computation are not recorded.
+
+    def record_slow(self):
+        params = self.params
+        if params == None or not 'result_version' in params or not 'compute' in self.timings:
+            return
+        try:
+            log = tiebreakservice.slowlog()
+            memory = tiebreakservice.peak_memory()
+            if not log.slow(self.timings['total'], memory):
+                return
+            data = self.input_stream().read()
+            entry = {
+                'published': str(datetime.datetime.now())[0:19],
+                'origin': self.origin,
+                'resultVersion': params['result_version'],
+                'contentHash': hashlib.sha256(data).hexdigest(),
+                'size': len(data),
+                'params': {key: params[key] for key in tiebreakservice.requestparams + ['input_file', 'priority'] if key in params},
+                'status': self.status,
+                'seconds': self.timings['total'],
+                'memory': memory,
+                'timings': self.timings,
+                'ranks': tiebreakservice.resultstore().load(params['result_version'])
+            }
+            log.record(params['result_version'], entry, data)
+        except (OSError, ValueError, EOFError):
+            pass
+
+    # decode_content
+    #   compressed content is decoded before the request key is computed, 
+    #   the same file has the same result version with or without compression
+
+    def decode_content(self):
+        params = self.params
+        if params['content_encoding'] in [None, '', 'identity']:
+            return
+        try:
+            params['data'] = self.input_stream().read()
+        except (OSError, EOFError, zlib.error):
+            self.error(401, 'Error reading file: "' + params['input_file'] + '"')
+        params['content_encoding'] = None
+
+    # not_modified
+    #   the response when the client has sent the current result version
+
+    def not_modified(self):
+        output = {
+          'filetype': 'tiebreak' if self.params['service'] == 'tiebreak' else 'chessjson',
+          'version': '1.0',
+          'origin': self.origin,
+          'published': str(datetime.datetime.now())[0:19],
+          'status': {'code': 304, 'error': [], 'info': 'Not modified'},
+          'resultVersion': self.params['result_version']
+        }
+        if 'event_id' in self.params:
+            output['eventId'] = self.params['event_id']
+        return output
+
+    def error_output(self, code, text):
+        return {
+          'filetype': 'Error',
+          'version': '1.0',
+          'origin': self.origin,
+          'published': str(datetime.datetime.now())[0:19],
+          'status': {'code': code, 'error': [text]}
+        }
+
+    # write_response
+    #   the response is gzip compressed when the client sends Accept-Encoding: gzip
+
+    def write_response(self, text, version, status=None):
+        data = text.encode('utf-8')
+        encoding = tiebreakservice.response_encoding(os.environ.get('HTTP_ACCEPT_ENCODING', ''), len(data))
+        if status != None:
+            sys.stdout.write('Status: ' + str(status) + ' ' + httpstatus[status] + '\r\n')
+        sys.stdout.write('Content-Type: application/json; charset=utf-8\r\n')
+        sys.stdout.write('ETag: "' + version + '"\r\n')
+        if encoding != None:
+            data = gzip.compress(data, compresslevel=6)
+            sys.stdout.write('Content-Encoding: ' + encoding + '\r\nVary: Accept-Encoding\r\n')
+        sys.stdout.write('\r\n')
+        sys.stdout.flush()
+        start = time.perf_counter()
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+        self.timings['write'] = time.perf_counter() - start
+
+    # compute_response
+    #   the response text, the rank summary of a tiebreak result is saved for change responses.
+    #   The computation waits for a worker slot in tiebreakservice.workqueue
+
+    def compute_response(self):
+        params = self.params
+        client = os.environ.get('REMOTE_ADDR', 'local')
+        with tiebreakservice.workqueue() as queue:
+            start = time.perf_counter()
+            queue.enter(client, params['priority'], tiebreakservice.supersede_key(params, client), params['result_version'], self.arrival)
+            self.timings['queue'] = time.perf_counter() - start
+            self.process_input()
+            start = time.perf_counter()
+            output = self.build_output()
+            text = helpers.json_string(output)
+            self.timings['output'] = time.perf_counter() - start
+        self.status = output['status']['code']
+        result = output['tiebreakResult'] if 'tiebreakResult' in output else None
+        if result != None and 'competitors' in result:
+            tiebreakservice.resultstore().save(params['result_version'], tiebreakservice.rank_summary(result))
+        return text
+
+    # change_response
+    #   keep only the competitors with a new rank or tiebreakScore since base_version
+
+    def change_response(self, text):
+        previous = tiebreakservice.resultstore().load(self.params['base_version'])
+        if previous == None:
+            return text
+        output = json.loads(text)
+        result = output['tiebreakResult'] if 'tiebreakResult' in output else None
+        if result == None or not 'competitors' in result:
+            return text
+        current = tiebreakservice.rank_summary(result)
+        result['competitors'] = [cmp for cmp in result['competitors'] if previous.get(str(cmp['cid'])) != current[str(cmp['cid'])]]
+        output['baseVersion'] = self.params['base_version']
+        return helpers.json_string(output)
+
+    def build_output(self):
+        output = super().build_output()
+        output['resultVersion'] = self.params['result_version']
+        if 'event_id' in self.params:
+            output['eventId'] = self.params['event_id']
+        return output
+
+    # update_event
+    #   Store the uploaded file or apply the round-delta to the stored file, see tiebreakservice.eventregistry.
+    #   The request continues as a request for the stored Chess-JSON file. 
+
+    def update_event(self):
+        params = self.params
+        registry = tiebreakservice.eventregistry()
+        event = params['event_id']
+        if event == '' and len(params['data']) > 0:
+            event = params['event_id'] = registry.new_event()
+        if not registry.valid(event):
+            self.error(501, "Invalid parameter eventid: " + str(event))
+        if len(params['data']) == 0 and len(params['delta']) == 0:
+            # polling, the stored file is used as it is
+            data = registry.load(event)
+            if data == None:
+                self.error(501, "Unknown event: " + event)
+            params['data'] = data
+            params['file_format'] = 'JSON'
+            return
+        with registry.lock(event):
+            if len(params['data']) > 0:
+                self.tournamentno = 0
+                try:
+                    self.read_input_file()
+                except:
+                    self.error(502, "Error when reading file: " + params['input_file'])
+            else:
+                data = registry.load(event)
+                if data == None:
+                    self.error(501, "Unknown event: " + event)
+                from chessjson import chessjson
+                self.chessfile = chessjson()
+                self.chessfile.parse_file(data.decode('utf-8'), params['verbose'])
+                tournamentno = helpers.parse_int(params['tournament_number'])
+                if self.chessfile.get_tournament(tournamentno) == None:
+                    self.error(501, "Invalid parameter --tournament-number")
+                error = self.chessfile.delta_error(params['delta'])
+                if error != None:
+                    self.error(501, "Invalid round-delta: " + error)
+                self.chessfile.apply_results(tournamentno, params['delta'])
+            data = helpers.json_string(self.chessfile.chessjson).encode('utf-8')
+            registry.save(event, data)
+        params['data'] = data
+        params['file_format'] = 'JSON'
+
 
          
  
@@ -9,31 +9,39 @@ THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR I
 Created on Mon Aug  7 16:48:53 2023
 @author: Otto Milvang, sjakk@milvang.no
 """
-import argparse
 import json
 import io
 import sys
+import time
 import datetime
 import codecs
-import base64
 import helpers
 #import cgi, cgitb
-from chessjson import chessjson
-from trf2json import trf2json
-from ts2json import ts2json
-from tiebreak import tiebreak
+
+# Format readers (chessjson, trf2json, ts2json) and argparse are imported
+# on demand, a run only pays for the modules it actually uses.
 
 # ==============================
 
 class commonmain:
 
+    # exceptions raised by self.error, they are not turned into a read error
+    errortypes = ()
+
     # constructor function    
     def __init__(self):
-         self.parser = argparse.ArgumentParser()
+         self.parser = None
          self.params = None
          self.filetype = 'chessjson'
          self.origin = 'checker, version 1.00'
          self.tournamentno = 1
+         self.timings = {}
+
+    def get_parser(self):
+        if self.parser == None:
+            import argparse
+            self.parser = argparse.ArgumentParser()
+        return self.parser
 
     def printhelp(self):
         print('checker [options]')
@@ -73,7 +81,7 @@ class commonmain:
 
 
     def read_common_command_line(self, strict):
-        parser = self.parser
+        parser = self.get_parser()
         parser.add_argument("-c", "--check", required=False, action='store_true',
             help="Shall we add checkflag to json file")
         parser.add_argument("-i", "--input-file", required=False,
@@ -141,26 +149,44 @@ class commonmain:
         jsondata = json.loads(data)
         command = jsondata['command']
         #helpers.json_output('c:\\temp\\t2.txt', command)
-        self.params = {
+        self.params = self.server_params(command)
+        return self.params
+
+    # server_params
+    #   params from the command of a chessserver request, chessdaemon builds its params with the same function.
+    #   The server computes all tournament types with is_rr False, tournamenttype only sets pre_determined and swiss
+
+    def server_params(self, command):
+        import base64
+        params = {
           'service' : command['service'],
           'check': command['service'] == 'tiebreak',
-          'data': base64.b64decode(command['content']), 
-          'input_file': command['filename'], 
-          'output_file': '-', 
-          'file_format': helpers.getFileFormat(command['filename']), 
-          'tournament_number' : str(command['tournamentno']), 
-          'number_of_rounds': (int(command['norounds']) if command['norounds'] != '' else -1), 
+          'data': base64.b64decode(command['content']) if 'content' in command else b'',
+          'content_encoding': command['encoding'] if 'encoding' in command else None,
+          'known_version': command['resultversion'] if 'resultversion' in command else None,
+          'base_version': command['baseversion'] if 'baseversion' in command else None,
+          'priority': command['priority'] if 'priority' in command else 'interactive',
+          'input_file': command['filename'] if 'filename' in command else '(event)',
+          'output_file': '-',
+          'file_format': helpers.getFileFormat(command['filename']) if 'filename' in command else 'JSON',
+          'tournament_number' : str(command['tournamentno']),
+          'number_of_rounds': (int(command['norounds']) if 'norounds' in command and command['norounds'] != '' else -1),
           'game_score': None, 
           'match_score': None, 
           'delimiter': None, 
           'experimental': False, 
           'verbose': True
         }
-        if self.params['service'] == 'tiebreak':
-            self.params['tie_break']= command['tiebreaks']
-            self.params['pre_determined'] = command['tournamenttype'] == 'p'
-            self.params['swiss'] = command['tournamenttype'] == 's'
-        return self.params        
+        if params['service'] == 'tiebreak':
+            params['tie_break']= command['tiebreaks']
+            params['pre_determined'] = command['tournamenttype'] == 'p'
+            params['swiss'] = command['tournamenttype'] == 's'
+            params['is_rr'] = False
+        # Round-delta upload, see chessserver.update_event
+        if 'eventid' in command:
+            params['event_id'] = command['eventid']
+            params['delta'] = {key: command[key] for key in ['gameList', 'matchList', 'competitors'] if key in command}
+        return params
         	
         
 
@@ -169,27 +195,42 @@ class commonmain:
         try:
             match(self.params['file_format']):
                 case 'JSON':
+                    from chessjson import chessjson
                     chessfile = chessjson()
                     charset = "utf-8"
                 case 'TRF':
+                    from trf2json import trf2json
                     chessfile = trf2json()
                     charset = "latin1"
             
                 case 'TS':
+                    from ts2json import ts2json
                     chessfile = ts2json()
                     charset = "ascii"
                 case _:
-                    error(503, "Error in file format: " + self.params['file_format'])
+                    self.error(503, "Error in file format: " + self.params['file_format'])
             
             
             self.chessfile = chessfile
             
             if not 'input_file' in self.params:
-                error(501, "Missing parameter --input-file")
+                self.error(501, "Missing parameter --input-file")
             if not 'output_file' in self.params:
-                    error(501, "Missing parameter --output-file")
+                    self.error(501, "Missing parameter --output-file")
+            if self.params['file_format'] == 'TS':
+                # The xml stream is parsed incrementally, only the selected tournament is read
+                if 'data' in self.params:
+                    f = self.input_stream()
+                elif self.params['input_file'] == '-':
+                    f = sys.stdin.buffer
+                else:
+                    f = io.open(self.params['input_file'], mode="rb")
+                chessfile.parse_file(f, self.params['verbose'], self.tournamentno)
+                f.close()
+                return
             if 'data' in self.params:
-                lines = self.params['data'].decode(charset)     
+                f = self.input_stream()
+                lines = f.read().decode(charset)
             elif self.params['input_file'] == '-':
                 sys.stdin.reconfigure(encoding = charset)
                 f = sys.stdin
@@ -202,12 +243,39 @@ class commonmain:
                 
             if charset == "latin1" and lines[0] == '\xef' and lines[1] == '\xbb' and lines[2] == '\xbf' :
                 lines = lines[3:]
-            chessfile.parse_file(lines,  self.params['verbose'])
-        except:
+            if self.params['file_format'] == 'JSON':
+                # Only the selected tournament is decoded
+                chessfile.parse_file(lines,  self.params['verbose'], self.tournamentno)
+            else:
+                chessfile.parse_file(lines,  self.params['verbose'])
+        except self.errortypes:
+            raise
+        except Exception:
             filename = '(stdin)' if self.params['input_file'] == '-' else self.params['input_file']
             chessfile.put_status(401, 'Error reading file: "' + filename + '"')
             raise
     
+    # input_stream
+    #   the request data as a binary stream, 
+    #   content_encoding gzip is decompressed while the parser reads, deflate (zlib or raw) in one step
+
+    def input_stream(self):
+        data = self.params['data']
+        match(self.params.get('content_encoding', None)):
+            case 'gzip':
+                import gzip
+                return gzip.GzipFile(fileobj=io.BytesIO(data), mode='rb')
+            case 'deflate':
+                import zlib
+                try:
+                    return io.BytesIO(zlib.decompress(data))
+                except zlib.error:
+                    return io.BytesIO(zlib.decompress(data, -zlib.MAX_WBITS))
+            case None | '' | 'identity':
+                return io.BytesIO(data)
+            case _:
+                self.error(503, "Error in content encoding: " + str(self.params['content_encoding']))
+
     def write_output_file(self):
         params = self.params
         chessfile = self.chessfile
@@ -226,16 +294,6 @@ class commonmain:
             f = open(params['output_file'], 'w')
 
         if params['check'] and self.core != None:
-            chessjson = {
-              'filetype': self.filetype,
-              'version': '1.0',
-              'origin': self.origin,
-              'published': str(datetime.datetime.now())[0:19],
-              'status': status,
-              'tiebreakResult': result
-            }
-    
-    
             if 'delimiter' in params and params['delimiter'] != None and params['delimiter'].upper() != 'JSON':
                 printcheckstatus = 1 if params['delimiter'][0] == '@' else 0
                 delimiter = params['delimiter'][printcheckstatus:]
@@ -247,13 +305,30 @@ class commonmain:
                 if code == 0 or code == 1 and len(delimiter) > 0:
                     self.write_text_file(f, result, delimiter)                    
             else:    
-                helpers.json_output(f, chessjson)
+                helpers.json_output(f, self.build_output())
         else:
-            helpers.json_output(f, chessfile.chessjson)
+            helpers.json_output(f, self.build_output())
         if not params['output_file'] == '-':
             f.close()
         return code
     
+    # build_output
+    #   the json structure written by write_output_file, 
+    #   a tiebreak result when checking, otherwise the chess file 
+    
+    def build_output(self):
+        chessfile = self.chessfile
+        if self.params['check'] and self.core != None:
+            return {
+              'filetype': self.filetype,
+              'version': '1.0',
+              'origin': self.origin,
+              'published': str(datetime.datetime.now())[0:19],
+              'status': chessfile.chessjson['status'],
+              'tiebreakResult': chessfile.result if hasattr(chessfile, 'result') else None
+            }
+        return chessfile.chessjson
+    
 
 
        
@@ -264,11 +339,33 @@ class commonmain:
         except:
             raise
             self.error(501, "Bad command line")
+        self.process_input()
         params = self.params
+        try:
+            code = self.write_output_file()
+            if params['experimental']:
+                self.chessfile.dumpresults()
+        except:
+            if params['verbose']:
+                raise
+            self.error(503, "Error when writing file: " + params['output_file'])
+        return(code) 
+
+    # process_input
+    #   read the input file and run the checker for self.params, nothing is written
+    
+    def process_input(self):
+        params = self.params
+        if not 'tournament_number' in self.params:
+            self.error(501, "Missing parameter --tournament-number")
+        self.tournamentno = helpers.parse_int(self.params['tournament_number'])
+        start = time.perf_counter()
         try:
             self.read_input_file()
             
-        except:
+        except self.errortypes:
+            raise
+        except Exception:
             if params['verbose']:
                 raise
             stat = self.chessfile.chessjson['status']
@@ -277,10 +374,7 @@ class commonmain:
             self.error(502, "Error when reading file: " + params['input_file'])
     
     
-        if not 'tournament_number' in self.params:
-            self.error(501, "Missing parameter --tournament-number")
-        self.tournamentno = helpers.parse_int(self.params['tournament_number'])
-        if self.tournamentno < 0 or self.tournamentno > len(self.chessfile.event['tournaments']):
+        if self.tournamentno < 0 or self.tournamentno > 0 and self.chessfile.get_tournament(self.tournamentno) == None:
             self.error(501, "Invalid parameter --tournament-number")
     
         # Add command line parameters
@@ -288,17 +382,10 @@ class commonmain:
             if score + '_score' in params and params[score +'_score'] != None:    
                 for arg in params[score +  '_score']:
                     self.chessfile.parse_score_system(score, arg)
+        self.timings['parse'] = time.perf_counter() - start
 
+        start = time.perf_counter()
         self.do_checker()        
-        
-        try:
-            code = self.write_output_file()
-            if params['experimental']:
-                self.chessfile.dumpresults()
-        except:
-            if params['verbose']:
-                raise
-            self.error(503, "Error when writing file: " + params['output_file'])
-        return(code) 
+        self.timings['compute'] = time.perf_counter() - start
 
         
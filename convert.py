@@ -9,7 +9,6 @@ THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR I
 Created on Mon Aug  7 16:48:53 2023
 @author: Otto Milvang, sjakk@milvang.no
 """
-import argparse
 import json
 import io
 import sys
@@ -17,7 +16,6 @@ import datetime
 import codecs
 import helpers
 from commonmain import commonmain
-from chessjson import chessjson
 
 # ==============================
 
@@ -39,11 +37,36 @@ class convert2jch(commonmain):
     #   -n = number-of-rounds
     #   -g = game-score
     #   -m = match-score
+    #   -F = output-format, JSON, TRF (TRF-16) or TRF2 (TRF-2x)
     #   -v = verbose and debug
 
 
     def read_command_line(self):
+        parser = self.get_parser()
+        parser.add_argument("-F", "--output-format", required=False,
+            default='JSON',
+            help="Output format, JSON, TRF (TRF-16) or TRF2 (TRF-2x)")
         self.read_common_command_line(True)
+        self.params['output_format'] = self.params['output_format'].upper()
+        if not self.params['output_format'] in ['JSON', 'TRF', 'TRF2']:
+            self.error(501, "Invalid parameter --output-format")
+
+
+    # write_output_file
+    #   TRF is written from the Chess-JSON structure, one tournament (default 1)
+
+    def write_output_file(self):
+        params = self.params
+        if params['output_format'] == 'JSON':
+            return super().write_output_file()
+        status = self.chessfile.chessjson['status']
+        code = status['code'] if 'code' in status else 500
+        if code > 0:
+            helpers.json_output(params['output_file'], self.build_output())
+            return code
+        from json2trf import json2trf
+        json2trf(self.chessfile).export_trf(params['output_file'], max(self.tournamentno, 1), params['output_format'])
+        return code
 
 
     def write_text_file(self, f, result, delimiter):                        
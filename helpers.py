@@ -91,86 +91,108 @@ def is_equal(txt, struct1, struct2):
 # Solve w, d, l, p, u, z for variables where W, D, L, P, U and Z present in equautins
 #
 
-def solve_scoresystem_p(equations, pab):
-    #print(equations) 
-    score = {
-        'sum': Decimal('0.0'),
-        'W': 0,
-        'D': 0,
-        'L': 0,
-        'P': 0,
-        'U': 0,
-        'Z': 0
-    }
-    #print ('PAB:', pab)
-    res = {}
+# Candidates for L, D, W and U, in the order they are tried
+
+def scoresystem_candidates():
     for l in [Decimal('0.0'), Decimal('0.5'), Decimal('1.0')]:
-       res['L'] = l
-       for d in [l+Decimal('0.5'), l+Decimal('1.0'), l+Decimal('1.5'), l+Decimal('2.0')]:
-            res['D'] = d
+        for d in [l+Decimal('0.5'), l+Decimal('1.0'), l+Decimal('1.5'), l+Decimal('2.0')]:
             for w in [d+d-l, d+d-l+1, d+d-l+Decimal('0.5'), d+d-l+Decimal('1.0'), d+d-l+Decimal('1.5'), d+d-l+Decimal('2.0')]:
-                res['W'] = w
                 for u in ['D', 'L', 'W']:
-                    res['U'] = res[u]
-                    ok = True
-                    #if l != 0.0 or d != 0.5 or w != 1.0 or u != 'D':
-                    #    continue
-                    for result in equations:
-                        tsum = 0
-                        tsum += result['W'] * w
-                        tsum += result['D'] * d
-                        tsum += result['L'] * l
-                        tsum += result['U'] * res[u]
-                        res['U'] = u
-                        res['Z'] = 0.0
-                        for key, value in result.items():
-                            if key != 'pab' and key != 'pres':
-                                score[key] += value
-                        pok = False
-                        if result['P'] > 0:
-                            for p in pab:
-                                #print(tsum, result['P'], res[p],  tsum + result['P'] * res[p], result['sum'])
-                                if tsum + result['P'] * res[p] == result['sum']:
-                                    #print('TRUE', result['sum'])
-                                    pok = True
-                                    result['pres'] = p
-                                    res['P'] = res[p]
-                        else:
-                            #print(tsum, result['P'], result['sum'])
-                            pok = tsum == result['sum']
-                        ok = ok and pok
-
-                    if ok:
-                        ret = {key: value for key, value in res.items() if score[key] != 0}
-                        for key in ['X', 'U']:
-                            if key in ret and res[key] in ['W', 'D', 'L', 'Z'] and ret[key] not in ret:
-                                ret[res[key]] = res[res[key]]
-                                
-                        for eq in equations:
-                            #print(eq)
-                            if 'pab' in eq:
-                                #print(eq)
-                                eq['pab']['wResult'] = eq['pres']
-                                res.pop('P', None) 
-                                
-                        #print(equations)
-                        #print('Score:', score)
-                        #print('Ret = ',  ret)
-                        return ret
-    #print('none')
-    #return None
+                    yield (l, d, w, u)
+
+scoresystem_pablists = [['W'], ['D'], ['L'], ['W', 'D'], ['D', 'L'], ['W', 'D', 'L']]
+
+#
+# solve_scoresystem_fast
+# Identical equations are merged to one row. Each candidate is tested once
+# against the rows without P, and for rows with P the set of pab results
+# that match is stored. A candidate is a solution for a pab list if each
+# P-row has a match in the list. Returns None if there is no solution.
+#
+
+def solve_scoresystem_fast(equations):
+    rows = {}
+    for eq in equations:
+        rows[(eq['sum'], eq['W'], eq['D'], eq['L'], eq['P'], eq['U'])] = True
+    plain = [row for row in rows if row[4] == 0]
+    prows = [row for row in rows if row[4] != 0]
+    candidates = []
+    for (l, d, w, u) in scoresystem_candidates():
+        value = {'W': w, 'D': d, 'L': l}
+        uval = value[u]
+        ok = True
+        for (rsum, rw, rd, rl, rp, ru) in plain:
+            if rw * w + rd * d + rl * l + ru * uval != rsum:
+                ok = False
+                break
+        if not ok:
+            continue
+        matches = []
+        for (rsum, rw, rd, rl, rp, ru) in prows:
+            tsum = rw * w + rd * d + rl * l + ru * uval
+            match = {p for p in ['W', 'D', 'L'] if tsum + rp * value[p] == rsum}
+            if len(match) == 0:
+                ok = False
+                break
+            matches.append(match)
+        if ok:
+            candidates.append((l, d, w, u, matches))
+    for pab in scoresystem_pablists:
+        for (l, d, w, u, matches) in candidates:
+            if all(not match.isdisjoint(pab) for match in matches):
+                return scoresystem_result(equations, pab, l, d, w, u)
+    return None
+
+# scoresystem_result
+# Build the result and update the equations with the result of the pab
+
+def scoresystem_result(equations, pab, l, d, w, u):
+    value = {'W': w, 'D': d, 'L': l}
+    res = {'L': l, 'D': d, 'W': w, 'U': u, 'Z': 0.0}
+    used = {key: False for key in ['L', 'D', 'W', 'U', 'Z', 'P']}
+    for eq in equations:
+        for key in used:
+            used[key] = used[key] or eq[key] != 0
+        if eq['P'] > 0:
+            tsum = 0
+            tsum += eq['W'] * w
+            tsum += eq['D'] * d
+            tsum += eq['L'] * l
+            tsum += eq['U'] * value[u]
+            for p in pab:
+                if tsum + eq['P'] * value[p] == eq['sum']:
+                    eq['pres'] = p
+                    res['P'] = value[p]
+    ret = {key: value for key, value in res.items() if used[key]}
+    if 'U' in ret and ret['U'] not in ret:
+        ret[u] = res[u]
+    for eq in equations:
+        if 'pab' in eq:
+            eq['pab']['wResult'] = eq['pres']
+    return ret
+
+# scoresystem_failed
+# No solution. Each equation with P gets 'pres' from the last candidate
+# where any of W, D or L matches, as the full search in earlier versions did.
+
+def scoresystem_failed(equations):
+    candidates = list(scoresystem_candidates())
+    for eq in equations:
+        if eq['P'] > 0:
+            for (l, d, w, u) in reversed(candidates):
+                value = {'W': w, 'D': d, 'L': l}
+                tsum = eq['W'] * w + eq['D'] * d + eq['L'] * l + eq['U'] * value[u]
+                match = [p for p in ['W', 'D', 'L'] if tsum + eq['P'] * value[p] == eq['sum']]
+                if len(match) > 0:
+                    eq['pres'] = match[-1]
+                    break
+    return None
 
 def solve_scoresystem(equations):
-    res = False
-    res = res or solve_scoresystem_p(equations, ['W'])
-    res = res or solve_scoresystem_p(equations, ['D'])
-    res = res or solve_scoresystem_p(equations, ['L'])
-    res = res or solve_scoresystem_p(equations, ['W', 'D'])
-    res = res or solve_scoresystem_p(equations, ['D', 'L'])
-    res = res or solve_scoresystem_p(equations, ['W', 'D','L'])
-
-    return(res)
-    #print(equations) 
+    res = solve_scoresystem_fast(equations)
+    if res == None:
+        return scoresystem_failed(equations)
+    return res
     
 
 #
@@ -216,13 +238,16 @@ def decimal_serializer(obj):
     raise TypeError("Type not serializable")
     
     
+def json_string(obj):
+    jsonout = json.dumps(obj, indent=2, default=decimal_serializer) 
+    return jsonout.replace('"_jpre_', '').replace('_jpost_"', '') + '\n'
+    
 def json_output(file, obj):
     if isinstance(file, str):
         f = sys.stdout if file == '-' else open(file, 'w')
     else:
         f = file
-    jsonout = json.dumps(obj, indent=2, default=decimal_serializer) 
-    f.write(jsonout.replace('"_jpre_', '').replace('_jpost_"', '') + '\n')
+    f.write(json_string(obj))
     if isinstance(file, str) and  file != '-':
         f.close()
         
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2024, Otto Milvang
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Created on Mon Oct 19 16:42:07 2026
+@author: Otto Milvang, sjakk@milvang.no
+"""
+
+import sys
+from decimal import *
+
+# FIDE title to TRF title
+trftitle = {'GM': 'g', 'IM': 'm', 'FM': 'f', 'CM': 'c', 'WGM': 'wg', 'WIM': 'wm', 'WFM': 'wf', 'WCM': 'wc'}
+
+# result letter in TRF, key is (result, played, rated, has opponent)
+trfresult = {
+    ('W', True, True, True): '1',
+    ('D', True, True, True): '=',
+    ('L', True, True, True): '0',
+    ('W', True, False, True): 'W',
+    ('D', True, False, True): 'D',
+    ('L', True, False, True): 'L',
+    ('W', False, False, True): '+',
+    ('D', False, False, True): 'H',
+    ('L', False, False, True): '-',
+    ('Z', False, False, True): '-',
+    ('W', False, False, False): 'F',
+    ('D', False, False, False): 'H',
+    ('L', False, False, False): 'Z',
+    ('Z', False, False, False): 'Z',
+    ('W', True, False, False): 'U',
+    ('P', True, False, False): 'U',
+    ('P', False, False, False): 'U',
+    ('U', True, False, True): '?',
+    ('U', True, False, False): '?',
+    }
+
+class json2trf:
+
+    # Write a tournament in a Chess-JSON structure as TRF
+    # version 'TRF' writes TRF-16 with team records in 013 lines,
+    # version 'TRF2' writes TRF-2x with team records in 310 lines (match points and rank)
+    # Team tournaments get 300 records where the board order differs from the team list
+    # Lines are written to the file one by one, nothing is built in memory except an index of the games
+
+    def __init__(self, chessfile):
+        self.chessfile = chessfile
+        self.event = chessfile.event
+        self.scoreLists = chessfile.scoreLists
+
+    # TRF is read as latin1, names are written in latin1 so the columns of a 001 record are not shifted.
+    # Characters outside latin1 are written as '?'
+
+    def export_trf(self, filename, tournamentno, version='TRF'):
+        if filename == '-':
+            sys.stdout.reconfigure(encoding='latin1', errors='replace')
+            f = sys.stdout
+        else:
+            f = open(filename, 'w', encoding='latin1', errors='replace')
+        self.write_trf(f, tournamentno, version)
+        if filename != '-':
+            f.close()
+
+    def write_trf(self, f, tournamentno, version='TRF'):
+        tournament = self.chessfile.get_tournament(tournamentno)
+        isteam = tournament['teamTournament'] if 'teamTournament' in tournament else False
+        if isteam:
+            players = [player for team in tournament['competitors'] for player in team['cplayers']]
+        else:
+            players = tournament['competitors']
+        players = sorted(players, key=lambda cmp: cmp['cid'])
+        games = self.index_games(tournament)
+        rounds = max([tournament['numRounds'] if 'numRounds' in tournament else 0] + [rnd for pgames in games.values() for rnd in pgames])
+        self.write_header(f, tournament, players, isteam, rounds)
+        for player in players:
+            f.write(self.player_line(tournament, player, games.get(player['cid'], {}), rounds) + '\n')
+        if isteam:
+            for team in sorted(tournament['competitors'], key=lambda cmp: cmp['cid']):
+                f.write(self.team_line(team, version) + '\n')
+            for line in self.order_lines(tournament, games):
+                f.write(line + '\n')
+            if 'teamSequence' in tournament:
+                f.write('352 ' + tournament['teamSequence'] + '\n')
+        absent = [str(player['cid']) for player in players if 'present' in player and not player['present']]
+        if len(absent) > 0 and not isteam:
+            f.write('XXZ ' + ' '.join(absent) + '\n')
+
+    # index_games
+    # cid -> round -> (game, color)
+
+    def index_games(self, tournament):
+        games = {}
+        for game in tournament['gameList']:
+            for color in ['white', 'black']:
+                if game[color] > 0:
+                    games.setdefault(game[color], {}).setdefault(game['round'], (game, color))
+        return games
+
+    def write_header(self, f, tournament, players, isteam, rounds):
+        info = self.event['eventInfo'] if 'eventInfo' in self.event else {}
+        name = info['fullName'] if 'fullName' in info else self.event.get('eventName', '')
+        lines = [('012', name)]
+        for (key, info_key) in [('022', 'site'), ('032', 'federation')]:
+            if info_key in info:
+                lines.append((key, info[info_key]))
+        for (key, info_key) in [('042', 'startDate'), ('052', 'endDate')]:
+            if info_key in info and info[info_key] != '':
+                lines.append((key, info[info_key][0:10].replace('-', '/')))
+        lines.append(('062', str(len(players))))
+        lines.append(('072', str(len([player for player in players if self.rating(player) > 0]))))
+        if isteam:
+            lines.append(('082', str(len(tournament['competitors']))))
+        lines.append(('092', tournament['tournamentType']))
+        if 'arbiters' in info:
+            pids = self.chessfile.all_pids()
+            arbiters = info['arbiters']
+            if 'chiefArbiter' in arbiters and arbiters['chiefArbiter'] in pids:
+                lines.append(('102', self.arbiter(pids[arbiters['chiefArbiter']])))
+            for pid in arbiters['arbiters'] if 'arbiters' in arbiters else []:
+                if pid in pids:
+                    lines.append(('112', self.arbiter(pids[pid])))
+        if 'timeControl' in tournament:
+            tc = tournament['timeControl']
+            for key in ['description:', 'description']:
+                if key in tc:
+                    lines.append(('122', tc[key]))
+        for (key, value) in lines:
+            f.write(key + ' ' + str(value) + '\n')
+        dates = [rnd['startTime'][2:10].replace('-', '/') if 'startTime' in rnd else '' for rnd in tournament.get('rounds', [])]
+        if any(date != '' for date in dates):
+            f.write(('132' + ' ' * 86 + ''.join(['  ' + date.ljust(8) for date in dates])).rstrip() + '\n')
+        f.write('XXR ' + str(rounds) + '\n')
+        rankorder = tournament['rankOrder'] if 'rankOrder' in tournament else []
+        if len(rankorder) > 0 and all(isinstance(tb, str) for tb in rankorder) and rankorder != ['PTS']:
+            f.write('212 ' + ' '.join(rankorder) + '\n')
+
+    def arbiter(self, profile):
+        name = (profile.get('firstName') or '') + ' ' + (profile.get('lastName') or '')
+        if 'fideOTitle' in profile and profile['fideOTitle'] != '':
+            name = profile['fideOTitle'] + ' ' + name
+        if 'fideId' in profile and profile['fideId'] > 0:
+            return name[0:33].ljust(33) + '{:11d}'.format(profile['fideId'])
+        return name
+
+    def rating(self, player):
+        if 'rating' in player and player['rating'] != None:
+            return player['rating']
+        pids = self.chessfile.all_pids()
+        if 'profileId' in player and player['profileId'] in pids:
+            rating = pids[player['profileId']].get('rating', 0)
+            return rating[0] if isinstance(rating, list) and len(rating) > 0 else rating if isinstance(rating, int) else 0
+        return 0
+
+    # player_line
+    # 001 record, fixed width as in TRF-16
+
+    def player_line(self, tournament, player, pgames, rounds):
+        pids = self.chessfile.all_pids()
+        profile = pids[player['profileId']] if 'profileId' in player and player['profileId'] in pids else {}
+        name = profile.get('fideName') or ''
+        if name == '':
+            name = (profile.get('lastName') or '') + ', ' + (profile.get('firstName') or '')
+        title = profile.get('fideTitle', '')
+        title = trftitle[title] if title in trftitle else title
+        rating = self.rating(player)
+        fideid = profile.get('fideId', 0)
+        birth = profile.get('birth') or ''
+        points = player['gamePoints'] if 'gamePoints' in player else self.points(tournament, pgames)
+        rank = player['rank'] if 'rank' in player else 0
+        line = ('001 {:4d} {:1.1}{:>3.3} {:33.33} {:4} {:3.3} {:>11} {:10.10} {:4.1f} {:>4}'.format(
+            player['cid'],
+            profile.get('sex', ' ') if profile.get('sex', 'u') in 'mfw' else ' ',
+            title,
+            name,
+            rating if rating > 0 else '',
+            profile.get('federation', ''),
+            fideid if fideid > 0 else '',
+            birth.replace('-', '/'),
+            Decimal(points),
+            rank if rank > 0 else ''))
+        for rnd in range(1, rounds + 1):
+            line += '  ' + self.round_field(pgames[rnd]) if rnd in pgames else '          '
+        return line.rstrip()
+
+    # round_field
+    # opponent, color and result for one round
+
+    def round_field(self, gamecolor):
+        (game, color) = gamecolor
+        other = 'black' if color == 'white' else 'white'
+        opponent = game[other]
+        result = self.result(game, color)
+        played = game['played'] if 'played' in game else True
+        rated = game['rated'] if 'rated' in game else played
+        if result == 'P':
+            played = True
+        key = (result, played, rated and played and opponent > 0, opponent > 0)
+        letter = trfresult[key] if key in trfresult else '-' if not played else '?'
+        col = color[0] if opponent > 0 else '-'
+        return ('{:4d}'.format(opponent) if opponent > 0 else '0000') + ' ' + col + ' ' + letter
+
+    def result(self, game, color):
+        key = 'wResult' if color == 'white' else 'bResult'
+        if key in game:
+            return game[key]
+        okey = 'bResult' if color == 'white' else 'wResult'
+        reverse = self.scoreLists['_reverse']
+        if okey in game and game[okey] in reverse:
+            return reverse[game[okey]]
+        return 'U'
+
+    def points(self, tournament, pgames):
+        name = tournament['gameScoreSystem'] if 'gameScoreSystem' in tournament else 'game'
+        return sum([self.chessfile.get_score(name, game, color) for (game, color) in pgames.values()], Decimal('0.0'))
+
+    # team_line
+    # 013 record in TRF-16, 310 record in TRF-2x
+
+    def team_line(self, team, version):
+        tids = self.chessfile.all_tids()
+        teamname = tids[team['teamId']]['teamName'] if 'teamId' in team and team['teamId'] in tids else ''
+        boards = ' '.join(['{:4d}'.format(player['cid'] if isinstance(player, dict) else player) for player in team['cplayers']])
+        if version != 'TRF2':
+            return '013 ' + '{:32.32}'.format(teamname) + boards
+        rank = team['rank'] if 'rank' in team else 0
+        return '310 {:3d} {:32.32} {:5.5} {:6} {:4.1f} {:6.1f} {:>3}  '.format(
+            team['cid'],
+            teamname,
+            '',
+            '',
+            Decimal(team['matchPoints'] if 'matchPoints' in team else 0),
+            Decimal(team['gamePoints'] if 'gamePoints' in team else 0),
+            rank if rank > 0 else '') + boards
+
+    # order_lines
+    # 300 records, the board order of a team in a round when it is not the order of the team list
+    # (games with a zero-point bye last), which is the order trf2json gives the boards without a 300 record
+
+    def order_lines(self, tournament, games):
+        lines = []
+        teamof = {}
+        cboard = {}
+        for team in tournament['competitors']:
+            for (board, player) in enumerate(team['cplayers']):
+                cid = player['cid'] if isinstance(player, dict) else player
+                teamof[cid] = team['cid']
+                cboard[cid] = board + 1
+        rounds = sorted(set([rnd for pgames in games.values() for rnd in pgames]))
+        for rnd in rounds:
+            played = {}
+            for (cid, pgames) in games.items():
+                if rnd in pgames and cid in teamof:
+                    played.setdefault(teamof[cid], []).append((cid, pgames[rnd]))
+            for team in sorted(played):
+                boards = [(game['board'] if 'board' in game else 0, cid) for (cid, (game, color)) in played[team]]
+                if any(board == 0 for (board, cid) in boards):
+                    continue
+                default = sorted(played[team], key=lambda elem: (elem[1][0]['black'] == 0 and self.result(elem[1][0], elem[1][1]) == 'Z', cboard[elem[0]]))
+                if [cid for (cid, gamecolor) in default] == [cid for (board, cid) in sorted(boards)] \
+                        and [board for (board, cid) in sorted(boards)] == list(range(1, len(boards) + 1)):
+                    continue
+                opponents = [teamof.get(game['black'] if color == 'white' else game['white'], 0) for (cid, (game, color)) in played[team]]
+                order = [0] * max([board for (board, cid) in boards])
+                for (board, cid) in boards:
+                    order[board - 1] = cid
+                lines.append('300 {:3d} {:3d} {:3d}'.format(rnd, team, max(opponents)) + ''.join([' {:4d}'.format(cid) for cid in order]))
+        return lines
+
+
+#### Module test ####
+
+def module_test():
+    from trf2json import trf2json
+    chessfile = trf2json()
+    with open('test.trf', 'r', encoding='utf-8') as f:
+        chessfile.parse_file(f.read(), True)
+    json2trf(chessfile).write_trf(sys.stdout, 1)
+
+    # Non-ASCII names and the results after them are read back unchanged
+    import os
+    import tempfile
+    profile = chessfile.chessjson['event']['profiles'][0]
+    (profile['lastName'], profile['firstName']) = ('Ødegård', 'Åse')
+    profile['fideName'] = 'Ødegård, Åse'
+    (fd, filename) = tempfile.mkstemp(suffix='.trf')
+    os.close(fd)
+    json2trf(chessfile).export_trf(filename, 1)
+    copy = trf2json()
+    with open(filename, 'r', encoding='latin1') as f:
+        copy.parse_file(f.read(), False)
+    os.remove(filename)
+    for (first, second) in zip(chessfile.get_tournament(1)['competitors'], copy.get_tournament(1)['competitors']):
+        assert first['gamePoints'] == second['gamePoints']
+    assert copy.chessjson['event']['profiles'][0]['fideName'] == 'Ødegård, Åse'
+    print('Round trip ok')
@@ -91,19 +91,26 @@ class tiebreak:
         self.maxboard = 0
         self.lastplayedround = 0
         self.primaryscore = None # use default
+        self.plan = self.make_plan(params)
+        self.ratings = self.plan_has(['ARO', 'TPR', 'PTP', 'APRO', 'APPO'])
         self.acceleration = tournament['acceleration'] if 'acceleration' in tournament else None   
 
         self.scoreLists = chessevent.scoreLists
         for scoresystem in event['scoreLists']:
             self.scoreLists[scoresystem['listName']] = scoresystem['scoreSystem']
+        chessevent.clear_scoretables()
+        # Team events: board games and game points are made by ensure_gamepoints when a tie-break needs them
+        self.tournament = tournament
+        self.build_all_games = chessevent.build_all_games
+        self.allgames = None
+        self.gamepoints = not self.isteam
+        self.boardpoints = None
         if self.isteam:
             self.matchscore = tournament['matchScoreSystem']
             self.gamescore = tournament['gameScoreSystem']
             [self.cplayers, self.cteam] = chessevent.build_tournament_teamcompetitors(tournament)
-            self.allgames = chessevent.build_all_games(tournament, self.cteam, False)    
             self.teams = self.prepare_competitors(tournament, 'match')
             self.compute_score(self.teams, 'mpoints', self.matchscore, self.currentround)
-            self.compute_score(self.teams, 'gpoints', self.gamescore, self.currentround)
         else:
             self.matchscore = tournament['gameScoreSystem']
             self.gamescore = tournament['gameScoreSystem']
@@ -129,6 +136,22 @@ class tiebreak:
                 self.rr = True
         self.unrated = int(params['unrated']) if params != None and 'unrated' in params else 0
         
+    # make_plan
+    # Set of tie-break names in params['tie_break'], None if no list is given
+    # Values that only some tie-breaks need are computed only when they are in the plan  
+
+    def make_plan(self, params):
+        if params == None or not 'tie_break' in params or params['tie_break'] == None:
+            return None
+        plan = set()
+        for txt in params['tie_break']:
+            comp = txt.upper().replace('!', '/').replace('#', '/').split('/', 1)
+            plan.add(comp[0].split(':')[0].split('@')[0])
+        return plan
+    
+    def plan_has(self, names):
+        return self.plan == None or not self.plan.isdisjoint(names)
+
     """
     compute_tiebreaks(self, chessfile, tournamentno, params)
     chessfile - Chessfile structure
@@ -161,7 +184,7 @@ class tiebreak:
                 correct = correct and cmp['rank'] == self.cmps[startno]['rank']
                 competitor['rank'] = cmp['rank'] = self.cmps[startno]['rank']
                 if self.isteam:
-                    competitor['boardPoints'] = self.cmps[startno]['tbval']['gpoints_' + 'bp']
+                    competitor['boardPoints'] = self.board_points(startno)
                 competitor['tiebreakDetails'] = self.cmps[startno]['tiebreakDetails']
                 competitor['tiebreakScore'] = cmp['tiebreakScore'] = self.cmps[startno]['tiebreakScore']
                 competitors.append(competitor)
@@ -170,7 +193,64 @@ class tiebreak:
                 'tiebreaks': self.tiebreaks, 
                 'competitors': competitors
             }
-    
+
+    """
+    verify_tiebreaks(self, chessfile, tournamentno, params)
+    Check the ranks in the file without building the output
+    After each tie-break the tie groups are checked top-down, and the check stops
+    at the first competitor whose rank in the file is outside its group.
+    When all groups have one competitor, the remaining tie-breaks are not computed.
+    chessfile.result gets check and the first mismatch (None if the ranks are correct)
+    """
+
+    def verify_tiebreaks(self, chessfile, tournamentno, params):
+        if chessfile.get_status() != 0:
+            return
+        stored = {cmp['cid']: cmp['rank'] for cmp in chessfile.get_tournament(tournamentno)['competitors']}
+        tblist = params['tie_break']
+        (mismatch, split) = self.first_mismatch(stored, False)
+        for pos in range (0, len(tblist)):
+            if mismatch != None or split:
+                break
+            mytb = self.parse_tiebreak(pos+1, tblist[pos])
+            self.compute_tiebreak(mytb)
+            (mismatch, split) = self.first_mismatch(stored, False)
+        if mismatch == None:
+            (mismatch, split) = self.first_mismatch(stored, True)
+        chessfile.result = {
+            'check': mismatch == None,
+            'mismatch': mismatch
+        }
+
+    # first_mismatch
+    # Walk the tie groups in self.rankorder top-down, a group with rank r and size s
+    # holds the ranks r .. r+s-1 when the remaining tie-breaks are computed.
+    # final - the rank in the file must be r
+    # returns the first mismatch and True if all groups have one competitor
+
+    def first_mismatch(self, stored, final):
+        rankorder = self.rankorder
+        split = True
+        start = 0
+        while start < len(rankorder):
+            rank = rankorder[start]['rank']
+            end = start + 1
+            while end < len(rankorder) and rankorder[end]['rank'] == rank:
+                end += 1
+            last = rank if final else rank + end - start - 1
+            split = split and end - start == 1
+            for cmp in rankorder[start:end]:
+                cid = cmp['cid']
+                if not cid in stored or stored[cid] < rank or stored[cid] > last:
+                    return ({
+                        'cid': cid,
+                        'rank': stored[cid] if cid in stored else None,
+                        'computedRank': [rank, last],
+                        'tiebreaks': len(self.tiebreaks)
+                    }, split)
+            start = end
+        return (None, split)
+
         
     
     def prepare_competitors(self, tournament, scoretype):
@@ -215,8 +295,6 @@ class tiebreak:
         for rst in tournament[scoretype + 'List']:
             if rst['round'] <= self.currentround or True:
                 self.prepare_result(cmps, rst, self.matchscore)
-                if self.isteam:
-                    self.prepare_teamgames(cmps, rst, self.gamescore)
         
         #helpers.json_output('c:\\temp\\mc01.txt', cmps)
         
@@ -228,7 +306,7 @@ class tiebreak:
         rnd = rst['round']
         white = rst['white']
         wPoints = self.get_score(scoresystem, rst, 'white')
-        wrPoints = self.get_score('rating', rst, 'white')
+        wrPoints = self.get_score('rating', rst, 'white') if self.ratings else None
         wVur = self.is_vur(rst, 'white')
         wrating = 0
         brating = 0
@@ -241,9 +319,10 @@ class tiebreak:
             if not 'bResult' in rst:
                 rst['bResult'] = self.scoreLists['_reverse'][rst['wResult']]
             bPoints = self.get_score(scoresystem, rst, 'black')
-            brPoints = self.get_score('rating', rst, 'black')
+            brPoints = self.get_score('rating', rst, 'black') if self.ratings else None
             bVur = self.is_vur(rst, 'black')
-            if (rst['played']):
+            # ratings and rating change only for rating based tie-breaks 
+            if (rst['played']) and self.ratings:
                 if 'rating' in cmps[white] and cmps[white]['rating'] > 0:
                     wrating = cmps[white]['rating']
                 if 'rating' in cmps[black] and cmps[black]['rating'] > 0:
@@ -279,6 +358,61 @@ class tiebreak:
                 }
         return
 
+    # ensure_gamepoints
+    # Team events, add board games and game points to each round and compute the gpoints score  
+
+    def ensure_gamepoints(self):
+        if self.gamepoints:
+            return
+        self.gamepoints = True
+        allgames = self.get_allgames()
+        for rst in self.tournament['matchList']:
+            self.prepare_teamgames(self.teams, rst, self.gamescore)
+        self.compute_score(self.teams, 'gpoints', self.gamescore, self.currentround)
+        
+    def get_allgames(self):
+        if self.allgames == None:
+            self.allgames = self.build_all_games(self.tournament, self.cteam, False)    
+        return self.allgames
+    
+    # board_points
+    # Board points for a team, the same as gpoints_bp from compute_score,
+    # without game points the board points are summed directly from the games 
+    
+    def board_points(self, startno):
+        if self.gamepoints:
+            return self.teams[startno]['tbval']['gpoints_' + 'bp']
+        if self.boardpoints == None:
+            self.boardpoints = self.compute_boardpoints()
+        return self.boardpoints[startno]
+
+    def compute_boardpoints(self):
+        boardpoints = {startno: {} for startno in self.teams}
+        if self.gamescore != 'game':
+            return boardpoints
+        allgames = self.get_allgames()
+        teamgames = {startno: {} for startno in self.teams}
+        for rst in self.tournament['matchList']:
+            rnd = rst['round']
+            for col in ['white', 'black']:
+                if col in rst and rst[col] > 0:
+                    teamgames[rst[col]][rnd] = allgames[rnd][rst[col]]
+        win = self.scoreLists[self.gamescore]['W']
+        for startno, rounds in teamgames.items():
+            bp = boardpoints[startno]
+            for rnd in range(1, self.currentround + 1):
+                for game in rounds[rnd] if rnd in rounds else []:
+                    white = game['white']
+                    black = game['black'] if 'black' in game else 0
+                    board = game['board'] if 'board' in game else 0
+                    for (col, player, opponent) in [('white', white, black), ('black', black, white)]:
+                        if player > 0 and board > 0 and self.cteam[player] == startno:
+                            points = self.get_score(self.gamescore, game, col)
+                            if game['played'] and opponent <= 0:  # PAB
+                                points = win
+                            bp[board] = bp[board] + points if board in bp else points
+        return boardpoints
+
     def prepare_teamgames(self, cmps, rst, scoresystem):
         maxboard = 0
         rnd = rst['round']
@@ -287,7 +421,7 @@ class tiebreak:
                 gpoints = 0
                 competitor = rst[col]
                 games = []
-                for game in self.allgames[rnd][competitor]:
+                for game in self.get_allgames()[rnd][competitor]:
                     white = game['white']
                     black = game['black'] if 'black' in game else 0
                     board = game['board'] if 'board' in game else 0
@@ -300,7 +434,7 @@ class tiebreak:
                         games.append(
                             {
                                 'points': points,
-                                'rpoints': self.get_score('rating', game, 'white'),
+                                'rpoints': self.get_score('rating', game, 'white') if self.ratings else None,
                                 'color': 'w',
                                 'vur': wVur,
                                 'played': game['played'],
@@ -316,7 +450,7 @@ class tiebreak:
                         games.append(
                             {
                                 'points': points,
-                                'rpoints': self.get_score('rating', game, 'black'),
+                                'rpoints': self.get_score('rating', game, 'black') if self.ratings else None,
                                 'color': 'b',
                                 'vur': bVur,
                                 'played': game['played'],
@@ -340,42 +474,47 @@ class tiebreak:
         else: 
             obj[rnd] = val
         
+    # score_counters
+    # Counters from compute_score that the tie-breaks in the plan read, all counters if there is no plan
+    # cop needs cod, lo / lp / lg for the Buchholz adjustment and bp for board points are always computed
+
+    def score_counters(self):
+        counters = {'win': 'WIN', 'won': 'WON', 'bpg': 'BPG', 'bwg': 'BWG', 'ge': 'GE', 'rep': 'REP', 
+                    'vur': 'VUR', 'num': 'NUM', 'cop': 'COP', 'cod': 'COD', 'csq': 'CSQ'}
+        if self.plan == None:
+            return set(counters) | {'cnt'}
+        needed = {name for name, tbname in counters.items() if tbname in self.plan}
+        if 'cop' in needed:
+            needed.add('cod')
+        return needed
+
     def compute_score(self, cmps, pointtype, scoretype, norounds):
         #scoresystem = self.scoresystem[scoretype]
         prefix = pointtype + "_"
         other ={'w': 'b', 'b': 'w', ' ': ' ' }  
+        needed = self.score_counters()
+        win_points = self.scoreLists[scoretype]['W']
+        teamgames = self.isteam and scoretype == 'game'
         for startno, cmp in cmps.items():
             tbscore = cmp['tbval']
             tbscore[prefix + 'sno'] = { 'val': startno }
             tbscore[prefix + 'rank'] = { 'val': cmp['orgrank'] }
             tbscore[prefix + 'rnd'] = { 'val': cmp['rnd'] }
-            tbscore[prefix + 'cnt'] = { 'val' : 0 }    # count number of elements (why)
             tbscore[prefix + 'points'] = { 'val' : Decimal('0.0') } # total points
-            tbscore[prefix + 'win'] = { 'val' : 0 }    # number of wins (played and unplayed)
-            tbscore[prefix + 'won'] = { 'val' : 0 }    # number of won games over the board
-            tbscore[prefix + 'bpg'] = { 'val' : 0 }    # number of black games played
-            tbscore[prefix + 'bwg'] = { 'val' : 0 }    # number of games won with black
-            tbscore[prefix + 'ge'] = { 'val' : 0 }     # number of games played + PAB
-            tbscore[prefix + 'rep'] = { 'val' : 0 }    # number of rounds elected to play (same as GE)
-            tbscore[prefix + 'vur'] = { 'val' : 0 }    # number of vurs (check algorithm)
-            tbscore[prefix + 'cop'] = { 'val' : '  ' } # color preference (for pairing)
-            tbscore[prefix + 'cod'] = { 'val' : 0 }    # color difference (for pairing)
-            tbscore[prefix + 'csq'] = { 'val' : '' }   # color sequence (for pairing)
-            tbscore[prefix + 'num'] = { 'val' : 0 }    # number of games played (for pairing)
-            tbscore[prefix + 'lp'] =  0     # last round played 
-            tbscore[prefix + 'lo'] = 0     # last round without vur
-            tbscore[prefix + 'lp'] = 0     # last round paired
-            tbscore[prefix + 'pfp'] = 0    # points from played games
-            tbscore[prefix + 'lg'] = 0 #self.scoreLists[scoretype]['D'] # Result of last game
-            tbscore[prefix + 'bp'] = {}    # Boardpoints
-            #if startno == 1:
-            #    helpers.json_output("c:\\temp\\new_trx_cmp_" + pointtype + '.json', cmp['rsts'])
-            #cmpr = sorted(cmp, key=lambda p: (p['rank'], p['tbval'][prefix + name]['val'], p['cid']))
-            #for rnd, rst in cmp['rsts'].items():
-                #print(rnd, cmp['rsts'])
-            #    if rnd <= norounds:
+            # cnt = number of elements, win = number of wins (played and unplayed), won = number of won games over the board 
+            # bpg = number of black games played, bwg = number of games won with black, ge = number of games played + PAB
+            # rep = number of rounds elected to play (same as GE), vur = number of vurs
+            # cop = color preference, cod = color difference, csq = color sequence, num = number of games played (for pairing)
+            counters = {name: { 'val' : '  ' if name == 'cop' else '' if name == 'csq' else 0 } for name in needed}
+            for name, counter in counters.items():
+                tbscore[prefix + name] = counter
+            lo = 0      # last round without vur
+            lp = 0      # last round paired / played 
+            pfp = 0     # points from played games
+            lg = 0      # Result of last game
+            bp = {}     # Boardpoints
+            cod = 0
             pcol = ' '   # Previous color
-            csq = ''
             for rnd in range(1, norounds+1):
                 if rnd in cmp['rsts']:
                     rst = cmp['rsts'][rnd]
@@ -385,101 +524,81 @@ class tiebreak:
                     tbscore[prefix + 'points']['val'] += points
 
                     # number of games
-                    if self.isteam and scoretype == 'game':
-                        gamelist = rst['games'] if 'games' in rst else []
-                    else:
-                        gamelist = [rst]
-#                    if startno == 1: 
-#                        print(pointtype, gamelist)
+                    gamelist = (rst['games'] if 'games' in rst else []) if teamgames else [rst]
                     for game in gamelist:
-                        #print(game)
-                        if self.isteam and scoretype == 'game':
+                        if teamgames:
                             points = game['points']
                             if game['played'] and game['opponent'] <= 0:  # PAB
                                 points = self.scoreLists[self.gamescore]['W']
                             board = game['board'];
-                            tbscore[prefix + 'bp'][board] = tbscore[prefix + 'bp'][board]  + points if board in tbscore[prefix + 'bp']  else points
-                            #tbscore[prefix + 'bp']['val'] += tbscore[prefix + 'bp'][board]
-
-                        self.addtbval(tbscore[prefix + 'cnt'], rnd, 1)   
-                        self.addtbval(tbscore[prefix + 'cnt'], 'val', 1)
-    
+                            bp[board] = bp[board] + points if board in bp else points
+                        opponent = game['opponent']
+                        played = game['played']
+                        vur = 1 if game['vur'] else 0
+                        if len(counters) > 0:
+                            win = 1 if points == win_points else 0
+                            black = 1 if game['color'] == 'b' and played else 0
+                            ge = 1 if played or win else 0
+                            values = {
+                                'cnt': 1,
+                                'win': win,
+                                'won': 1 if win and played and opponent > 0 else 0,
+                                'bpg': black,
+                                'bwg': black * win,
+                                'ge': ge,
+                                'rep': ge,
+                                'vur': vur
+                                }
+                            for name, counter in counters.items():
+                                if name in values:
+                                    val = values[name]
+                                    counter[rnd] = counter[rnd] + val if rnd in counter else val
+                                    counter['val'] += val
     
                         # result in last game
-                        if rnd == self.rounds and game['opponent'] > 0:
-                            tbscore[prefix + 'lg'] += points 
-                            #if startno == 1:
-                            #    print(pointtype, points, tbscore[prefix + 'lg'])
+                        if rnd == self.rounds and opponent > 0:
+                            lg += points 
     
                         # points from played games
-                        if game['played']:
-                            self.addtbval(tbscore[prefix + 'num'], rnd, game['opponent'])                                 
-                            if game['opponent'] > 0:
-                                self.addtbval(tbscore[prefix + 'num'], 'val', 1)                                 
-                                tbscore[prefix + 'pfp'] += points
-                                ocol = ncol = game['color']
+                        if played:
+                            if 'num' in counters:
+                                self.addtbval(counters['num'], rnd, opponent)
+                            if opponent > 0:
+                                if 'num' in counters:
+                                    counters['num']['val'] += 1
+                                pfp += points
+                                ocol = game['color']
                                 pf = 1 if ocol == 'w' else -1
-                                self.addtbval(tbscore[prefix + 'cod'], rnd, pf)
-                                self.addtbval(tbscore[prefix + 'cod'], 'val', pf)
-                                pf = tbscore[prefix + 'cod']['val']
-                                ncol = (other[ocol] + 'bbbbwwww')[pf]
-                                ncol += (str(abs(pf)) if ocol != pcol else '2')   
-                                #if ocod > -2 and ocod < 2:
-                                #    ncol = 'w' if ocol == 'b' else 'b'
-                                #    ncol = ncol.upper() if ncol.upper() == tbscore[prefix + 'cop']['val'].upper() else ncol
-
-        
-                                csq += ocol
+                                cod += pf
+                                if 'cod' in counters:
+                                    self.addtbval(counters['cod'], rnd, pf)
+                                    counters['cod']['val'] = cod
+                                if 'cop' in counters:
+                                    ncol = (other[ocol] + 'bbbbwwww')[cod]
+                                    ncol += (str(abs(cod)) if ocol != pcol else '2')   
+                                    self.addtbval(counters['cop'], rnd, ncol)
+                                    counters['cop']['val'] = ncol
+                                if 'csq' in counters:
+                                    self.addtbval(counters['csq'], rnd, ocol)
+                                    counters['csq']['val'] += ocol
                                 pcol = ocol
-                                self.addtbval(tbscore[prefix + 'csq'], rnd, ocol)
-                                self.addtbval(tbscore[prefix + 'csq'], 'val', ocol)
-
-                                self.addtbval(tbscore[prefix + 'cop'], rnd, ncol)
-                                tbscore[prefix + 'cop']['val'] = ncol
     
                             # last played game (or PAB)
-                            if rnd > tbscore[prefix + 'lp']:
-                                tbscore[prefix + 'lp'] = rnd
-                        elif 'points' in game and game['points'] == self.scoreLists[scoretype]['W']:
-                            self.addtbval(tbscore[prefix + 'num'], rnd, 0)
-                            
-                        # number of win
-                        win = 1 if points == self.scoreLists[scoretype]['W'] else 0
-                        self.addtbval(tbscore[prefix + 'win'], rnd, win)
-                        self.addtbval(tbscore[prefix + 'win'], 'val', win)
-    
-                        # number of win played over the board
-                        won = 1 if points == self.scoreLists[scoretype]['W'] and game['played'] and game['opponent'] > 0  else 0
-                        self.addtbval(tbscore[prefix + 'won'], rnd, won)
-                        self.addtbval(tbscore[prefix + 'won'], 'val', won)
-    
-                        # number of games played with black
-                        bpg = 1 if game['color'] == 'b' and game['played'] else 0
-                        self.addtbval(tbscore[prefix + 'bpg'], rnd, bpg)
-                        self.addtbval(tbscore[prefix + 'bpg'], 'val', bpg)
-                            
-                        # number of win played with black
-                        bwg = 1 if game['color'] == 'b' and game['played'] and points == self.scoreLists[scoretype]['W'] else 0
-                        self.addtbval(tbscore[prefix + 'bwg'], rnd, bwg)
-                        self.addtbval(tbscore[prefix + 'bwg'], 'val', bwg)
-    
-                        # number of games elected to play
-                        #ge = 1 if game['played'] or (game['opponent'] > 0 and points == self.scoreLists[scoretype]['W']) else 0
-                        ge = 1 if game['played'] or (points == self.scoreLists[scoretype]['W']) else 0
-                        self.addtbval(tbscore[prefix + 'ge'], rnd, ge)
-                        self.addtbval(tbscore[prefix + 'ge'], 'val', ge)
-                        self.addtbval(tbscore[prefix + 'rep'], rnd, ge)
-                        self.addtbval(tbscore[prefix + 'rep'], 'val', ge)
-    
-                        vur = 1 if game['vur'] else 0
-                        self.addtbval(tbscore[prefix + 'vur'], rnd, vur)
-                        self.addtbval(tbscore[prefix + 'vur'], 'val', vur)
+                            if rnd > lp:
+                                lp = rnd
+                        elif 'num' in counters and 'points' in game and game['points'] == win_points:
+                            self.addtbval(counters['num'], rnd, 0)
     
                         # last round with opponent, pab or fpb (16.2.1, 16.2.2, 16.2.3 and 16.2.4)
-                        if rnd > tbscore[prefix + 'lo'] and (vur == 0):
-                            tbscore[prefix + 'lo'] = rnd
-                        if rnd > tbscore[prefix + 'lp'] and (game['opponent'] > 0):
-                            tbscore[prefix + 'lp'] = rnd
+                        if rnd > lo and (vur == 0):
+                            lo = rnd
+                        if rnd > lp and (opponent > 0):
+                            lp = rnd
+            tbscore[prefix + 'lo'] = lo
+            tbscore[prefix + 'lp'] = lp
+            tbscore[prefix + 'pfp'] = pfp
+            tbscore[prefix + 'lg'] = lg
+            tbscore[prefix + 'bp'] = bp
 
 
 
@@ -733,14 +852,15 @@ class tiebreak:
         name = tb['name'].lower()
         isfb = name == 'fb' or name == 'afb' or tb['modifiers']['fmo']
         (opoints, oscoretype, oprefix) = self.get_scoreinfo(tb, True)
-        (spoints, sscoretype, sprefix) = self.get_scoreinfo(tb, name == 'sb')
+        is_sb = name == 'sb' or name == 'esb' or (len(name) == 5 and name[0] == 'e' and name[3:5] == 'sb')
+        # the second score is only used by Sonneborn-Berger 
+        (spoints, sscoretype, sprefix) = self.get_scoreinfo(tb, name == 'sb' or not is_sb)
         opointsfordraw = self.scoreLists[oscoretype]['D'] * (self.teamsize if opoints == 'gpoints' else 1)
         spointsfordraw = self.scoreLists[sscoretype]['D'] * (self.teamsize if spoints == 'gpoints' else 1)
         #print(opointsfordraw, spointsfordraw)
         name = tb['name'].lower()
         if name == 'aob': 
             name = 'bh'
-        is_sb = name == 'sb' or name == 'esb' or (len(name) == 5 and name[0] == 'e' and name[3:5] == 'sb')
         if name == 'esb' or (len(name) == 5 and name[0] == 'e' and name[3:5] == 'sb'):
             (spoints, sscoretype, sprefix) = self.get_scoreinfo(tb, False)
         for startno, cmp in cmps.items():
@@ -897,6 +1017,7 @@ class tiebreak:
 
 
     def compute_boardcount(self, tb, cmps, rounds):
+        self.ensure_gamepoints()
         (points, scoretype, prefix) = self.get_scoreinfo(tb, True)
         for startno, cmp in cmps.items():
             tbscore = cmp['tbval']
@@ -909,6 +1030,7 @@ class tiebreak:
         return 'bc'
 
     def compute_singlerun_topbottomboardresult(self, tb, cmps,  rounds, ro, loopcount):
+        self.ensure_gamepoints()
         name = tb['name'].lower()
         (points, scoretype, prefix) = self.get_scoreinfo(tb, True)
         if loopcount == 0:
@@ -937,6 +1059,7 @@ class tiebreak:
         return loopcount < self.maxboard
 
     def compute_score_strength_combination(self, tb, cmps, currentround):
+        self.ensure_gamepoints()
         (points, scoretype, prefix) = self.get_scoreinfo(tb, True)
         for startno, cmp in cmps.items():
             dividend = cmp['tbval'][prefix + 'sssc']['val']
@@ -1231,6 +1354,7 @@ class tiebreak:
                 key = 'g'
         match key:
             case 'g':
+                self.ensure_gamepoints()
                 return ["gpoints", self.gamescore, "gpoints_"]
             case 'm':
                 return ["mpoints", self.matchscore, "mpoints_"]
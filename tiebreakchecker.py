@@ -9,7 +9,6 @@ THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR I
 Created on Mon Aug  7 16:48:53 2023
 @author: Otto Milvang, sjakk@milvang.no
 """
-import argparse
 import json
 import io
 import sys
@@ -17,9 +16,6 @@ import datetime
 import codecs
 import helpers
 from commonmain import commonmain
-from chessjson import chessjson
-from trf2json import trf2json
-from ts2json import ts2json
 from tiebreak import tiebreak
 
 # ==============================
@@ -48,21 +44,25 @@ class tiebreakchecker(commonmain):
     #   -r = sort on rank order
     #   -u = set rating for unrated players
     #   -t = tie-break
+    #   -V = verify ranks only, stop at first mismatch
     #   -v = verbose and debug
     #   -x = expirimental
     
     
     def read_command_line(self):
-        self.parser.add_argument("-p", "--pre-determined", required=False, action='store_true',
+        parser = self.get_parser()
+        parser.add_argument("-p", "--pre-determined", required=False, action='store_true',
             help="Use rules for tournament with pre-determined pairing")
-        self.parser.add_argument("-s", "--swiss", required=False, action='store_true',
+        parser.add_argument("-s", "--swiss", required=False, action='store_true',
             help="Use rules for swiss tournament")
-        self.parser.add_argument("-r", "--rank", required=False, action='store_true',
+        parser.add_argument("-r", "--rank", required=False, action='store_true',
             help="Sort on rank order")
-        self.parser.add_argument("-u", "--unrated", required=False,
+        parser.add_argument("-u", "--unrated", required=False,
             default=0,
             help="rating for unrated players")
-        self.parser.add_argument("-t", "--tie-break", required=False, nargs='*',
+        parser.add_argument("-V", "--verify", required=False, action='store_true',
+            help="Verify ranks only, stop at first mismatch")
+        parser.add_argument("-t", "--tie-break", required=False, nargs='*',
             default=['PTS', 'BH/C2/p'],
             #default=['PTS', 'DE'],
             help="Delimiter in output text" )
@@ -91,6 +91,13 @@ class tiebreakchecker(commonmain):
           
 
     def write_text_file(self, f, result, delimiter):                        
+        if 'mismatch' in result:
+            mismatch = result['mismatch']
+            if mismatch != None:
+                f.write('StartNo' + delimiter + 'Rank' + delimiter + 'Computed\n')
+                f.write(str(mismatch['cid']) + delimiter + str(mismatch['rank']) + delimiter 
+                        + '-'.join(dict.fromkeys([str(r) for r in mismatch['computedRank']])) + '\n')
+            return
         if self.params['rank']:
             sortorder = sorted(result['competitors'], key=lambda cmp: (cmp['rank'], cmp['cid']))
             header = ['Rank', 'StartNo']
@@ -126,7 +133,10 @@ class tiebreakchecker(commonmain):
         if chessfile.get_status() == 0:
             if self.tournamentno > 0:
                 tb  = tiebreak(chessfile, self.tournamentno, params['number_of_rounds'], params)
-                tb.compute_tiebreaks(chessfile, self.tournamentno, params) 
+                if params['verify']:
+                    tb.verify_tiebreaks(chessfile, self.tournamentno, params)
+                else:
+                    tb.compute_tiebreaks(chessfile, self.tournamentno, params) 
             else: 
                 tb = tiebreak(chessfile, self.tournamentno, params['number_of_rounds'], params)
         self.core = tb
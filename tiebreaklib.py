@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2024, Otto Milvang
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Created on Mon Oct 19 10:12:31 2026
+@author: Otto Milvang, sjakk@milvang.no
+"""
+
+"""
+Library interface to tie-break and convert, for use in-process
+
+    import tiebreaklib
+    result = tiebreaklib.compute(data, 'TRF', ['PTS', 'BH/C1'])
+
+data is the file content as bytes, the format is JSON, TRF or TS.
+content_encoding = 'gzip' or 'deflate' if data is compressed.
+Other parameters have the same names as the tiebreakchecker options:
+tournament_number, number_of_rounds, game_score, match_score, is_rr, unrated,
+verify, check and verbose. Score systems are lists of strings like ['W:1.0,D:0.5'].
+service = 'convert' returns the Chess-JSON file.
+
+The result is the same structure as tiebreakchecker -c writes to stdout
+(values are Decimal, use helpers.json_string for text).
+An error returns the structure with filetype 'Error' and status code >= 400.
+
+Nothing is read from stdin or written to stdout, and sys.exit is never called.
+Each call has its own reader, tiebreak and random generator, so calls
+can run in parallel threads.
+"""
+
+import datetime
+import helpers
+from commonmain import commonmain
+
+
+# error raised by tiebreaklib.error, output is the error structure
+
+class tiebreakliberror(Exception):
+
+    def __init__(self, output):
+        super().__init__(output['status']['error'])
+        self.output = output
+
+
+class tiebreaklib(commonmain):
+
+    defaults = {
+        'service': 'tiebreak',
+        'check': True,
+        'input_file': '(data)',
+        'output_file': '-',
+        'file_format': 'TRF',
+        'tournament_number': '1',
+        'number_of_rounds': -1,
+        'game_score': None,
+        'match_score': None,
+        'delimiter': None,
+        'experimental': False,
+        'verbose': False,
+        'is_rr': None,
+        'unrated': 0,
+        'verify': False,
+        'tie_break': ['PTS', 'BH/C2/p']
+        }
+
+    def __init__(self, params):
+        super().__init__()
+        self.origin = 'tiebreaklib ver. 1.00'
+        self.core = None
+        self.params = dict(self.defaults)
+        self.params.update(params)
+        self.params['tournament_number'] = str(self.params['tournament_number'])
+
+
+    # errors raised by self.error are not caught by commonmain
+    errortypes = (tiebreakliberror,)
+
+    # error
+    #   raise the error structure instead of printing and exit
+
+    def error(self, code, txt):
+        if code >= 400:
+            raise tiebreakliberror(self.error_output(code, txt))
+
+    def error_output(self, code, txt):
+        return {
+            'filetype': 'Error',
+            'version': '1.0',
+            'origin': self.origin,
+            'published': str(datetime.datetime.now())[0:19],
+            'status': {'code': code, 'error': txt if isinstance(txt, list) else [txt]}
+            }
+
+
+    def do_checker(self):
+        params = self.params
+        self.core = None
+        if params['service'] != 'tiebreak':
+            return
+        from tiebreak import tiebreak
+        if params['check']:
+            self.filetype = 'tiebreak'
+        chessfile = self.chessfile
+        if chessfile.get_status() == 0:
+            tb = tiebreak(chessfile, self.tournamentno, params['number_of_rounds'], params)
+            if self.tournamentno > 0 and params['verify']:
+                tb.verify_tiebreaks(chessfile, self.tournamentno, params)
+            elif self.tournamentno > 0:
+                tb.compute_tiebreaks(chessfile, self.tournamentno, params)
+            self.core = tb
+
+
+    # run
+    #   read self.params['data'] and return the result structure,
+    #   an exception in the parser or the tie-break engine is returned as an error with code 500
+
+    def run(self):
+        try:
+            if not self.params['file_format'] in ['JSON', 'TRF', 'TS']:
+                self.error(503, "Error in file format: " + str(self.params['file_format']))
+            self.process_input()
+            return self.build_output()
+        except tiebreakliberror as err:
+            return err.output
+        except Exception as err:
+            return self.error_output(500, 'Internal error: ' + repr(err))
+
+
+def compute(data, file_format, tie_break=None, **params):
+    params['data'] = data
+    params['file_format'] = file_format
+    if tie_break != None:
+        params['tie_break'] = tie_break
+    return tiebreaklib(params).run()
+
+
+#### Module test ####
+
+def module_test():
+    with open('test.trf', 'rb') as f:
+        data = f.read()
+    helpers.json_output('-', compute(data, 'TRF', ['PTS', 'BH/C1', 'SB']))
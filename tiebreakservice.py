@@ -0,0 +1,724 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2024, Otto Milvang
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Created on Mon Oct 19 18:03:44 2026
+@author: Otto Milvang, sjakk@milvang.no
+"""
+
+"""
+Shared state for the tie-break service
+
+chessserver runs as CGI, one process per request. State that must be shared
+between requests is kept in a spool directory, set with the environment
+variable TIEBREAK_SPOOL (default <tempdir>/tiebreakserver).
+
+fileflight    - single-flight: concurrent requests with the same key wait for
+                one computation and get the same response text
+eventregistry - Chess-JSON files of live events, updated with round-delta requests
+resultstore   - rank and score of each competitor per result version, for change responses
+workqueue     - worker slots with priority classes, per-client limits and cancellation of superseded requests
+metrics       - request counters and stage timings in Prometheus text format
+slowlog       - requests over the latency or memory limit, with the input for replay in tiebreakchecker
+"""
+
+import os
+import sys
+import re
+import json
+import time
+import uuid
+import signal
+import threading
+import hashlib
+import tempfile
+
+
+def spooldir(sub=''):
+    path = os.environ.get('TIEBREAK_SPOOL', os.path.join(tempfile.gettempdir(), 'tiebreakserver'))
+    path = os.path.join(path, sub) if sub != '' else path
+    os.makedirs(path, exist_ok=True)
+    return path
+
+# remove_old
+#   remove files with the suffix not modified for keep seconds
+
+def remove_old(directory, suffix, keep):
+    now = time.time()
+    for name in os.listdir(directory):
+        if name.endswith(suffix):
+            try:
+                if now - os.path.getmtime(os.path.join(directory, name)) > keep:
+                    os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+# request_key
+#   sha256 of the decoded input data and the parameters that change the response,
+#   event_id is included because the response has the eventId
+
+requestparams = ['service', 'file_format', 'tournament_number', 'number_of_rounds', 'tie_break',
+                 'pre_determined', 'swiss', 'is_rr', 'game_score', 'match_score', 'unrated', 'event_id']
+
+def request_key(params):
+    options = {key: params[key] for key in requestparams if key in params}
+    h = hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode('utf-8'))
+    h.update(params['data'] if 'data' in params else b'')
+    return h.hexdigest()
+
+# etags
+#   the versions in an HTTP If-None-Match header
+
+def etags(header):
+    return [tag.strip().removeprefix('W/').strip('"') for tag in header.split(',') if tag.strip() != '']
+
+# response_encoding
+#   gzip if the client accepts it (HTTP Accept-Encoding), small responses are not compressed
+
+def response_encoding(accept, size, minsize=1024):
+    if size < minsize:
+        return None
+    for item in accept.split(','):
+        fields = [field.strip() for field in item.split(';')]
+        if fields[0].lower() in ['gzip', 'x-gzip']:
+            qvalue = 1.0
+            for field in fields[1:]:
+                if field.startswith('q='):
+                    try:
+                        qvalue = float(field[2:])
+                    except ValueError:
+                        qvalue = 0.0
+            if qvalue > 0:
+                return 'gzip'
+    return None
+
+
+
+class fileflight:
+
+    # Single-flight between processes with lock files in the spool directory
+    #   <key>.lock - a process is computing the response
+    #   <key>.json - the response text, kept for keep seconds
+    #   <key>.error - the leader was superseded (serviceerror 409)
+    # A process that finds the lock waits for the response. A leader superseded by a newer
+    # request fails the waiting processes with the same 409. If the lock is older than timeout
+    # seconds or the leader fails otherwise, the waiting process computes the response itself.
+
+    def __init__(self, directory=None, timeout=120.0, keep=10.0, poll=0.05):
+        self.directory = directory if directory != None else spooldir('flight')
+        self.timeout = timeout
+        self.keep = keep
+        self.poll = poll
+        self.coalesced = False
+
+    # run
+    #   compute() returns the response text, run returns the text from this or another process
+
+    def run(self, key, compute):
+        lock = os.path.join(self.directory, key + '.lock')
+        result = os.path.join(self.directory, key + '.json')
+        failed = os.path.join(self.directory, key + '.error')
+        deadline = time.time() + self.timeout
+        waited = False
+        while time.time() < deadline:
+            text = self.read_result(result)
+            if text != None:
+                self.coalesced = True
+                return text
+            if waited:
+                text = self.read_result(failed)
+                if text != None:
+                    raise serviceerror(409, text)
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                waited = True
+                self.remove_stale(lock)
+                time.sleep(self.poll)
+                continue
+            try:
+                if os.path.exists(failed):
+                    os.remove(failed)
+                text = compute()
+                tmp = result + '.' + str(os.getpid())
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                os.replace(tmp, result)
+            except serviceerror as err:
+                if err.code == 409:
+                    with open(failed, 'w', encoding='utf-8') as f:
+                        f.write(err.text)
+                raise
+            finally:
+                os.close(fd)
+                os.remove(lock)
+            self.cleanup()
+            return text
+        return compute()
+
+    def read_result(self, result):
+        try:
+            if time.time() - os.path.getmtime(result) > self.keep:
+                return None
+            with open(result, 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def remove_stale(self, lock):
+        try:
+            if time.time() - os.path.getmtime(lock) > self.timeout:
+                os.remove(lock)
+        except OSError:
+            pass
+
+    # cleanup
+    #   remove old responses
+
+    def cleanup(self):
+        remove_old(self.directory, '.json', self.keep)
+        remove_old(self.directory, '.error', self.keep)
+
+
+class filelock:
+
+    # Exclusive lock between processes, a lock file created with O_EXCL
+    # A lock older than timeout seconds is left by a dead process and is taken over
+
+    def __init__(self, path, timeout=30.0, poll=0.05):
+        self.path = path
+        self.timeout = timeout
+        self.poll = poll
+        self.fd = None
+
+    def __enter__(self):
+        while self.fd == None:
+            try:
+                self.fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > self.timeout:
+                        os.remove(self.path)
+                except OSError:
+                    pass
+                time.sleep(self.poll)
+        return self
+
+    def __exit__(self, *args):
+        os.close(self.fd)
+        os.remove(self.path)
+        self.fd = None
+
+
+class eventregistry:
+
+    # Chess-JSON files of registered events
+    #   <event>.json - the Chess-JSON file
+    #   <event>.lock - a request is updating the file
+    # The event id is a random hex string returned to the client on first upload.
+    # Events not updated for keep seconds are removed.
+
+    eventid = re.compile(r'[0-9a-f]{32}')
+
+    def __init__(self, directory=None, keep=14*86400.0):
+        self.directory = directory if directory != None else spooldir('events')
+        self.keep = keep
+
+    def new_event(self):
+        self.cleanup()
+        return uuid.uuid4().hex
+
+    def valid(self, event):
+        return isinstance(event, str) and self.eventid.fullmatch(event) != None
+
+    def lock(self, event):
+        return filelock(os.path.join(self.directory, event + '.lock'))
+
+    def filename(self, event):
+        return os.path.join(self.directory, event + '.json')
+
+    def load(self, event):
+        try:
+            with open(self.filename(event), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def save(self, event, data):
+        filename = self.filename(event)
+        tmp = filename + '.' + str(os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, filename)
+
+    def cleanup(self):
+        remove_old(self.directory, '.json', self.keep)
+        remove_old(self.directory, '.error', self.keep)
+
+
+# rank_summary
+#   cid -> [rank, tiebreakScore] of a tiebreakResult, the values compared in a change response.
+#   Numbers are converted as in the response text, so a summary of a computed result
+#   is equal to the summary of the same result read back from the response.
+
+def rank_summary(result):
+    summary = {str(cmp['cid']): [cmp['rank'], cmp['tiebreakScore']] for cmp in result['competitors']}
+    return json.loads(json.dumps(summary, default=float))
+
+
+class resultstore:
+
+    # Rank summary of each computed result, <version>.json, kept for keep seconds
+
+    def __init__(self, directory=None, keep=2*86400.0):
+        self.directory = directory if directory != None else spooldir('results')
+        self.keep = keep
+
+    def save(self, version, summary):
+        filename = os.path.join(self.directory, version + '.json')
+        tmp = filename + '.' + str(os.getpid())
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(summary, f)
+        os.replace(tmp, filename)
+        remove_old(self.directory, '.json', self.keep)
+
+    def load(self, version):
+        if not isinstance(version, str) or re.fullmatch(r'[0-9a-f]{64}', version) == None:
+            return None
+        try:
+            with open(os.path.join(self.directory, version + '.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+# serviceerror
+#   a request is not computed, code is the status code of the response
+
+class serviceerror(Exception):
+
+    def __init__(self, code, text):
+        super().__init__(text)
+        self.code = code
+        self.text = text
+
+
+# supersede_key
+#   requests with the same key are uploads of the same event or file and tournament,
+#   a newer request with another result version supersedes the older ones
+
+def supersede_key(params, client):
+    source = params['event_id'] if 'event_id' in params else client + ':' + params['input_file']
+    options = [source, params['service'], params['tournament_number'], params['tie_break'] if 'tie_break' in params else None]
+    return hashlib.sha256(json.dumps(options).encode('utf-8')).hexdigest()
+
+
+# trylock
+#   non-blocking exclusive lock on an open file, the system releases the lock when the process dies
+
+def trylock(fd):
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+class workqueue:
+
+    # Priority queue and worker slots shared by the chessserver processes
+    #   <ticket>.json - a waiting or running request, with client, key, version, arrival, pid and state
+    #   <ticket>.lock - locked by the process as long as the ticket is in use
+    #   slot-<n>.lock - a worker slot, locked by the process that uses it
+    #   <key>.latest  - arrival and version of the newest request for a supersede key
+    # The ticket name sorts by priority class and arrival time. The first waiting ticket
+    # takes the next free slot, so an interactive request never waits behind a batch request.
+    # The arrival is the start time of the request, also for a request that waited for another computation.
+    # The locks are held with trylock, a ticket with a lock that can be taken is left by a dead process
+    # and is removed, and the slot of a dead process is free. Only a live process is sent a signal.
+    # When a request is superseded, a waiting request stops and a running request gets SIGTERM.
+    # The number of slots is TIEBREAK_WORKERS (default cpu count) and the number of
+    # waiting or running requests per client is TIEBREAK_CLIENT_LIMIT (default 4).
+
+    priorities = {'interactive': 0, 'batch': 1}
+
+    def __init__(self, directory=None, workers=None, clientlimit=None, timeout=600.0, poll=0.05):
+        self.directory = directory if directory != None else spooldir('queue')
+        self.workers = workers if workers != None else int(os.environ.get('TIEBREAK_WORKERS', os.cpu_count()))
+        self.clientlimit = clientlimit if clientlimit != None else int(os.environ.get('TIEBREAK_CLIENT_LIMIT', 4))
+        self.timeout = timeout
+        self.poll = poll
+        self.ticket = None
+        self.ticketfd = None
+        self.slot = None
+        self.slotfd = None
+        self.handler = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.leave()
+
+    # enter
+    #   wait for a worker slot, raises serviceerror 429 if the client has too many requests
+    #   and 409 if a newer request supersedes this one.
+    #   arrival - time.time_ns() at the start of the request
+
+    def enter(self, client, priority, key, version, arrival):
+        if not priority in self.priorities:
+            raise serviceerror(501, 'Invalid parameter priority: ' + str(priority))
+        tickets = self.read_tickets()
+        if len([info for info in tickets.values() if info['client'] == client]) >= self.clientlimit:
+            raise serviceerror(429, 'Too many requests from ' + client)
+        self.ticket = '{:d}-{:020d}-{:d}'.format(self.priorities[priority], arrival, os.getpid())
+        self.ticketfd = os.open(os.path.join(self.directory, self.ticket + '.lock'), os.O_CREAT | os.O_RDWR)
+        trylock(self.ticketfd)
+        self.info = {'client': client, 'key': key, 'version': version, 'arrival': arrival, 'pid': os.getpid(), 'state': 'wait'}
+        self.write_file(self.ticket + '.json', self.info)
+        with filelock(os.path.join(self.directory, key + '.latest.lock')):
+            latest = self.read_file(key + '.latest')
+            if latest == None or latest['arrival'] < arrival:
+                self.write_file(key + '.latest', {'arrival': arrival, 'version': version})
+        for (ticket, info) in tickets.items():
+            if info['key'] == key and info['version'] != version and info['arrival'] < arrival \
+                    and info['state'] == 'run' and info['pid'] != os.getpid() and self.alive(ticket):
+                try:
+                    os.kill(info['pid'], signal.SIGTERM)
+                except OSError:
+                    pass
+        while True:
+            if self.superseded():
+                raise serviceerror(409, 'Superseded by a newer request')
+            waiting = sorted([ticket for (ticket, info) in self.read_tickets().items() if info['state'] == 'wait'])
+            if len(waiting) == 0 or waiting[0] >= self.ticket:
+                for n in range(self.workers):
+                    if self.take_slot(n):
+                        # SIGTERM is sent only to running tickets, the handler must be set first
+                        if threading.current_thread() is threading.main_thread():
+                            self.handler = signal.signal(signal.SIGTERM, self.terminated)
+                        self.info['state'] = 'run'
+                        self.write_file(self.ticket + '.json', self.info)
+                        # a newer request may have come while this one was waiting
+                        if self.superseded():
+                            raise serviceerror(409, 'Superseded by a newer request')
+                        return
+            time.sleep(self.poll)
+
+    def leave(self):
+        if self.handler != None:
+            signal.signal(signal.SIGTERM, self.handler)
+            self.handler = None
+        if self.slotfd != None:
+            os.close(self.slotfd)
+        if self.ticket != None:
+            self.remove_file(self.ticket + '.json')
+            os.close(self.ticketfd)
+            self.remove_file(self.ticket + '.lock')
+        self.slot = None
+        self.slotfd = None
+        self.ticket = None
+        self.ticketfd = None
+
+    def terminated(self, signum, frame):
+        raise serviceerror(409, 'Superseded by a newer request')
+
+    def superseded(self):
+        latest = self.read_file(self.info['key'] + '.latest')
+        return latest != None and latest['arrival'] > self.info['arrival'] and latest['version'] != self.info['version']
+
+    # take_slot
+    #   the slot files are not removed, a slot is free when its lock can be taken
+
+    def take_slot(self, n):
+        fd = os.open(os.path.join(self.directory, 'slot-' + str(n) + '.lock'), os.O_CREAT | os.O_RDWR)
+        if not trylock(fd):
+            os.close(fd)
+            return False
+        self.slot = n
+        self.slotfd = fd
+        return True
+
+    # alive
+    #   the process of the ticket holds the lock of the ticket
+
+    def alive(self, ticket):
+        try:
+            fd = os.open(os.path.join(self.directory, ticket + '.lock'), os.O_RDWR)
+        except OSError:
+            return False
+        try:
+            return not trylock(fd)
+        finally:
+            os.close(fd)
+
+    # state
+    #   number of waiting and running requests
+
+    def state(self):
+        states = [info['state'] for info in self.read_tickets().values()]
+        return {'waiting': states.count('wait'), 'running': states.count('run')}
+
+    # read_tickets
+    #   ticket -> info of waiting and running requests, tickets of dead processes are removed
+
+    def read_tickets(self):
+        tickets = {}
+        now = time.time()
+        names = os.listdir(self.directory)
+        for name in names:
+            filename = os.path.join(self.directory, name)
+            if name.endswith('.lock') and not name.startswith('slot-') and not name.endswith('.latest.lock'):
+                # lock of a process that died before it wrote the ticket
+                try:
+                    if not name[:-5] + '.json' in names and now - os.path.getmtime(filename) > 10.0 and not self.alive(name[:-5]):
+                        self.remove_file(name)
+                except OSError:
+                    pass
+            if not name.endswith('.json'):
+                continue
+            info = self.read_file(name)
+            if info == None or not self.alive(name[:-5]):
+                self.remove_file(name)
+                self.remove_file(name[:-5] + '.lock')
+                continue
+            tickets[name[:-5]] = info
+        remove_old(self.directory, '.latest', self.timeout)
+        return tickets
+
+    def read_file(self, name):
+        try:
+            with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_file(self, name, info):
+        filename = os.path.join(self.directory, name)
+        tmp = filename + '.' + str(os.getpid())
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        os.replace(tmp, filename)
+
+    def remove_file(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+
+# metric name -> (type, help text)
+metricdefs = {
+    'tiebreak_requests_total': ('counter', 'Requests by service and file format'),
+    'tiebreak_responses_total': ('counter', 'Responses by source, computed, coalesced or not_modified'),
+    'tiebreak_errors_total': ('counter', 'Responses by status code >= 400'),
+    'tiebreak_worker_seconds_total': ('counter', 'Seconds used in worker slots'),
+    'tiebreak_stage_seconds': ('histogram', 'Request latency by stage'),
+    'tiebreak_queue_waiting': ('gauge', 'Requests waiting for a worker slot'),
+    'tiebreak_workers_busy': ('gauge', 'Worker slots in use'),
+    'tiebreak_workers': ('gauge', 'Worker slots'),
+    'tiebreak_stream_groups': ('gauge', 'Standings streams with subscribers in chessdaemon'),
+    'tiebreak_stream_subscribers': ('gauge', 'Subscribers of standings streams in chessdaemon'),
+    }
+
+
+class metrics:
+
+    # Counters of the service, shared by the chessserver processes in metrics.json in the spool directory.
+    # Each request adds its observations under a file lock and writes the Prometheus text file
+    # TIEBREAK_METRICS_FILE (default tiebreak.prom in the same directory) for a textfile collector.
+    # chessdaemon serves the same text on /metrics.
+    #   counters   - list of (name, labels, value)
+    #   stages     - stage -> seconds, added to the histogram tiebreak_stage_seconds
+    #   gauges     - list of (name, labels, value)
+
+    buckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+    def __init__(self, directory=None):
+        self.directory = directory if directory != None else spooldir('metrics')
+        self.textfile = os.environ.get('TIEBREAK_METRICS_FILE', os.path.join(self.directory, 'tiebreak.prom'))
+
+    def observe(self, counters=[], stages={}, gauges=[]):
+        with filelock(os.path.join(self.directory, 'metrics.lock')):
+            state = self.load()
+            for (name, labels, value) in counters:
+                values = state['counters'].setdefault(name, {})
+                key = self.labelstring(labels)
+                values[key] = values.get(key, 0) + value
+            histogram = state['histograms'].setdefault('tiebreak_stage_seconds', {})
+            for (stage, seconds) in stages.items():
+                key = self.labelstring({'stage': stage})
+                if not key in histogram:
+                    histogram[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+                values = histogram[key]
+                for (index, limit) in enumerate(self.buckets):
+                    if seconds <= limit:
+                        values['buckets'][index] += 1
+                values['sum'] += seconds
+                values['count'] += 1
+            for (name, labels, value) in gauges:
+                state['gauges'].setdefault(name, {})[self.labelstring(labels)] = value
+            filename = os.path.join(self.directory, 'metrics.json')
+            with open(filename + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(filename + '.tmp', filename)
+            with open(self.textfile + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(self.render(state))
+            os.replace(self.textfile + '.tmp', self.textfile)
+
+    def load(self):
+        try:
+            with open(os.path.join(self.directory, 'metrics.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'counters': {}, 'histograms': {}, 'gauges': {}}
+
+    def labelstring(self, labels):
+        return ','.join([key + '="' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"' for (key, value) in labels.items()])
+
+    # render
+    #   Prometheus text format, gauges can be replaced with current values
+
+    def render(self, state, gauges=[]):
+        state = dict(state, gauges=dict(state['gauges']))
+        for (name, labels, value) in gauges:
+            state['gauges'][name] = dict(state['gauges'].get(name, {}), **{self.labelstring(labels): value})
+        lines = []
+        for (name, (mtype, text)) in metricdefs.items():
+            section = 'histograms' if mtype == 'histogram' else 'gauges' if mtype == 'gauge' else 'counters'
+            if not name in state[section]:
+                continue
+            lines.append('# HELP ' + name + ' ' + text)
+            lines.append('# TYPE ' + name + ' ' + mtype)
+            for (key, value) in sorted(state[section][name].items()):
+                if mtype != 'histogram':
+                    lines.append(name + ('{' + key + '}' if key != '' else '') + ' ' + str(value))
+                    continue
+                for (limit, count) in zip(self.buckets, value['buckets']):
+                    lines.append(name + '_bucket{' + key + ',le="' + str(limit) + '"} ' + str(count))
+                lines.append(name + '_bucket{' + key + ',le="+Inf"} ' + str(value['count']))
+                lines.append(name + '_sum{' + key + '} ' + repr(value['sum']))
+                lines.append(name + '_count{' + key + '} ' + str(value['count']))
+        return '\n'.join(lines) + '\n'
+
+
+# peak_memory
+#   peak resident memory of this process in MB, 0 where the resource module is missing (Windows)
+
+def peak_memory():
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class slowlog:
+
+    # Requests slower than TIEBREAK_SLOW_SECONDS (default 10) or using more than TIEBREAK_SLOW_MEMORY MB 
+    # (default 1024) are recorded in the spool directory slow:
+    #   <version>.slow.json  - parameters, content hash, stage timings, ranks and the tiebreakchecker command line
+    #   <version>.input.<ext> - the decoded input file, only when TIEBREAK_SLOW_INPUT=1
+    # The same input and parameters have the same version, a repeated slow request replaces the record.
+    # Records are kept for keep seconds.
+
+    extensions = {'JSON': '.json', 'TRF': '.txt', 'TS': '.trx'}
+
+    def __init__(self, directory=None, keep=7*86400.0):
+        self.directory = directory if directory != None else spooldir('slow')
+        self.keep = keep
+        self.seconds = float(os.environ.get('TIEBREAK_SLOW_SECONDS', 10.0))
+        self.memory = float(os.environ.get('TIEBREAK_SLOW_MEMORY', 1024.0))
+        self.capture = os.environ.get('TIEBREAK_SLOW_INPUT', '0') == '1'
+
+    def slow(self, seconds, memory):
+        return seconds >= self.seconds or memory >= self.memory
+
+    # record
+    #   entry - the record, input and replay are added
+    #   data  - the decoded input file
+
+    def record(self, version, entry, data):
+        params = entry['params']
+        inputfile = params['input_file'] if 'input_file' in params else '-'
+        entry['input'] = None
+        if self.capture:
+            inputfile = os.path.join(self.directory, version + '.input' + self.extensions.get(params['file_format'], '.json'))
+            with open(inputfile, 'wb') as f:
+                f.write(data)
+            entry['input'] = inputfile
+        entry['replay'] = self.replay(params, inputfile)
+        filename = os.path.join(self.directory, version + '.slow.json')
+        tmp = filename + '.' + str(os.getpid())
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=2, default=str)
+        os.replace(tmp, filename)
+        for suffix in ['.json', '.txt', '.trx']:
+            remove_old(self.directory, suffix, self.keep)
+        return filename
+
+    # replay
+    #   the tiebreakchecker arguments for the same computation
+
+    def replay(self, params, inputfile):
+        args = ['python', 'tiebreakchecker.py', '-i', inputfile, '-f', params['file_format'],
+                '-e', str(params['tournament_number']), '-n', str(params['number_of_rounds'])]
+        if params['service'] == 'tiebreak':
+            args.append('-c')
+        if 'tie_break' in params:
+            args += ['-t'] + params['tie_break']
+        match params.get('is_rr', None):
+            case True:
+                args.append('-p')
+            case False:
+                args.append('-s')
+        for (option, score) in [('-g', 'game_score'), ('-m', 'match_score')]:
+            value = params.get(score, None)
+            if isinstance(value, dict):
+                args += [option, ','.join([key + ':' + str(points) for (key, points) in value.items()])]
+            elif value:
+                args += [option] + list(value)
+        return args
+
+    # check
+    #   replay a record with the captured input, True when the ranks and tiebreakScore
+    #   are the same as in the server response, None when the record can not be replayed
+
+    def check(self, filename):
+        import subprocess
+        with open(filename, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        if entry.get('input', None) == None or entry.get('ranks', None) == None:
+            return None
+        args = [sys.executable] + entry['replay'][1:]
+        proc = subprocess.run(args, capture_output=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        try:
+            output = json.loads(proc.stdout.decode('utf-8'))
+        except ValueError:
+            return False
+        result = output['tiebreakResult'] if 'tiebreakResult' in output else None
+        if result == None or not 'competitors' in result:
+            return False
+        return rank_summary(result) == entry['ranks']
+
+
+#### Module test ####
+
+def module_test():
+    log = slowlog()
+    for name in sorted(os.listdir(log.directory)):
+        if name.endswith('.slow.json'):
+            print(name, log.check(os.path.join(log.directory, name)))
@@ -0,0 +1,410 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2024, Otto Milvang
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the “Software”), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+Created on Mon Oct 19 13:05:12 2026
+@author: Otto Milvang, sjakk@milvang.no
+"""
+import random
+import berger
+import helpers
+from xml.sax.saxutils import quoteattr
+
+# ==============================
+#
+# Generate synthetic tournaments
+#
+#   tg = tournamentgenerator({'type': 'swiss', 'players': 200, 'rounds': 9})
+#   tg.generate()
+#   trf = tg.write_trf()
+#   ts = tg.write_ts()
+#   jch = tg.write_json()
+#
+# params:
+#   type - swiss, rr or team
+#   players - number of players, for team events the number of teams
+#   rounds - number of rounds (swiss and team), rr plays all rounds in the berger table
+#   teamsize - number of boards in team events
+#   byes - probability that a player asks for a half point bye in a round (swiss)
+#   forfeits - probability that a game is forfeited
+#   seed - seed for the random generator, the same seed gives the same tournament
+#
+# Results are stored as TRF result codes
+#   games[rnd] = [ [white, black, wresult, bresult, board], ... ]
+#   byes[rnd] = { cid: code } where code is U (pairing allocated bye), H or Z
+#
+
+class tournamentgenerator:
+
+    # constructor function
+    def __init__(self, params):
+        self.params = {
+            'type': 'swiss',
+            'players': 100,
+            'rounds': 9,
+            'teamsize': 4,
+            'byes': 0.02,
+            'forfeits': 0.01,
+            'seed': 1
+            }
+        for key, value in params.items():
+            if value != None:
+                self.params[key] = value
+        self.rng = random.Random(self.params['seed'])
+        self.isteam = self.params['type'] == 'team'
+        self.players = {}
+        self.teams = {}
+        self.games = {}
+        self.byes = {}
+        self.numrounds = 0
+
+    def generate(self):
+        params = self.params
+        if self.isteam:
+            numteams = params['players'] + params['players'] % 2
+            teamsize = params['teamsize']
+            for tid in range(1, numteams + 1):
+                self.teams[tid] = {'cid': tid, 'name': 'Team ' + str(tid), 'players': []}
+                for board in range(1, teamsize + 1):
+                    cid = (tid - 1) * teamsize + board
+                    self.teams[tid]['players'].append(cid)
+            self.make_players(numteams * teamsize)
+            self.numrounds = min(params['rounds'], numteams - 1)
+            self.play_team()
+        else:
+            self.make_players(params['players'])
+            if params['type'] == 'rr':
+                self.numrounds = len(self.players) - 1 + len(self.players) % 2
+                self.play_rr()
+            else:
+                self.numrounds = params['rounds']
+                self.play_swiss()
+        return self
+
+    # make_players
+    # Players get a rating in descending order, start number follows rating
+    # (for team events start numbers follow boards)
+
+    def make_players(self, numplayers):
+        ratings = sorted([int(self.rng.gauss(1800, 300)) for i in range(numplayers)], reverse=True)
+        for cid in range(1, numplayers + 1):
+            rating = max(1000, min(2850, ratings[cid - 1]))
+            if self.isteam:
+                teamsize = self.params['teamsize']
+                rating = max(1000, min(2850, 2300 - ((cid - 1) // teamsize) * 15 - ((cid - 1) % teamsize) * 40 + int(self.rng.gauss(0, 60))))
+            self.players[cid] = {
+                'cid': cid,
+                'lastName': 'Player' + str(cid),
+                'firstName': 'Gen',
+                'sex': 'm' if self.rng.random() < 0.8 else 'w',
+                'rating': rating,
+                'federation': 'NOR',
+                'fideId': 1000000 + cid,
+                'birth': str(1950 + cid % 60) + '/01/01',
+                'points': 0.0,
+                'whites': 0,
+                'pab': False,
+                'opponents': set()
+                }
+
+    # play_game
+    # return [wresult, bresult] for a game between two ratings
+
+    def play_game(self, wrating, brating):
+        if self.rng.random() < self.params['forfeits']:
+            return ['+', '-'] if self.rng.random() < 0.5 else ['-', '+']
+        expected = 1 / (1 + 10 ** ((brating - wrating) / 400))
+        draw = 0.15
+        rnd = self.rng.random()
+        if rnd < expected - draw:
+            return ['1', '0']
+        if rnd < expected + draw:
+            return ['=', '=']
+        return ['0', '1']
+
+    def add_game(self, rnd, white, black, board):
+        pw = self.players[white]
+        pb = self.players[black]
+        [wres, bres] = self.play_game(pw['rating'], pb['rating'])
+        self.games[rnd].append([white, black, wres, bres, board])
+        pw['points'] += self.trfpoints(wres)
+        pb['points'] += self.trfpoints(bres)
+        pw['whites'] += 1
+        pb['whites'] -= 1
+        pw['opponents'].add(black)
+        pb['opponents'].add(white)
+        return [wres, bres]
+
+    def trfpoints(self, code):
+        match code:
+            case '1' | '+' | 'U' | 'F':
+                return 1.0
+            case '=' | 'H':
+                return 0.5
+        return 0.0
+
+    # play_swiss
+    # Players are ordered on score and rating, and paired top down in
+    # the score groups, avoiding rematches. Color goes to the player with
+    # fewest whites.
+
+    def play_swiss(self):
+        for rnd in range(1, self.numrounds + 1):
+            self.games[rnd] = []
+            self.byes[rnd] = {}
+            order = sorted(self.players.values(), key=lambda p: (-p['points'], -p['rating'], p['cid']))
+            available = []
+            for player in order:
+                if rnd < self.numrounds and self.rng.random() < self.params['byes']:
+                    self.byes[rnd][player['cid']] = 'H'
+                    player['points'] += 0.5
+                else:
+                    available.append(player['cid'])
+            if len(available) % 2 == 1:
+                # lowest player without a pairing allocated bye
+                pab = available[-1]
+                for cid in reversed(available):
+                    if not self.players[cid]['pab']:
+                        pab = cid
+                        break
+                available.remove(pab)
+                self.players[pab]['pab'] = True
+                self.byes[rnd][pab] = 'U'
+                self.players[pab]['points'] += 1.0
+            board = 0
+            while len(available) > 0:
+                p1 = available.pop(0)
+                opponent = 0
+                for p2 in available:
+                    if not p2 in self.players[p1]['opponents']:
+                        opponent = p2
+                        break
+                if opponent == 0:
+                    opponent = available[0]
+                available.remove(opponent)
+                board += 1
+                if self.players[p1]['whites'] <= self.players[opponent]['whites']:
+                    self.add_game(rnd, p1, opponent, board)
+                else:
+                    self.add_game(rnd, opponent, p1, board)
+
+    # play_rr
+    # Pairings from berger.bergertables, the dummy player gives a zero point bye
+
+    def play_rr(self):
+        numplayers = len(self.players)
+        rr = berger.bergertables(numplayers)
+        for rnd in range(1, self.numrounds + 1):
+            self.games[rnd] = []
+            self.byes[rnd] = {}
+            for board, pair in rr['parining'][rnd].items():
+                white = pair['white']
+                black = pair['black']
+                if white > numplayers:
+                    self.byes[rnd][black] = 'Z'
+                elif black > numplayers:
+                    self.byes[rnd][white] = 'Z'
+                else:
+                    self.add_game(rnd, white, black, board)
+
+    # play_team
+    # Teams are paired on match points, home team has white on odd boards
+
+    def play_team(self):
+        teamsize = self.params['teamsize']
+        for team in self.teams.values():
+            team['mpoints'] = 0
+            team['gpoints'] = 0.0
+            team['opponents'] = set()
+        for rnd in range(1, self.numrounds + 1):
+            self.games[rnd] = []
+            self.byes[rnd] = {}
+            order = sorted(self.teams.values(), key=lambda t: (-t['mpoints'], -t['gpoints'], t['cid']))
+            available = [team['cid'] for team in order]
+            while len(available) > 0:
+                t1 = available.pop(0)
+                opponent = 0
+                for t2 in available:
+                    if not t2 in self.teams[t1]['opponents']:
+                        opponent = t2
+                        break
+                if opponent == 0:
+                    opponent = available[0]
+                available.remove(opponent)
+                [home, away] = [t1, opponent] if rnd % 2 == 1 else [opponent, t1]
+                self.teams[home]['opponents'].add(away)
+                self.teams[away]['opponents'].add(home)
+                hpoints = apoints = 0.0
+                for board in range(1, teamsize + 1):
+                    hp = self.teams[home]['players'][board - 1]
+                    ap = self.teams[away]['players'][board - 1]
+                    if board % 2 == 1:
+                        [hres, ares] = self.add_game(rnd, hp, ap, board)
+                    else:
+                        [ares, hres] = self.add_game(rnd, ap, hp, board)
+                    hpoints += self.trfpoints(hres)
+                    apoints += self.trfpoints(ares)
+                self.teams[home]['gpoints'] += hpoints
+                self.teams[away]['gpoints'] += apoints
+                self.teams[home]['mpoints'] += 2 if hpoints > apoints else 1 if hpoints == apoints else 0
+                self.teams[away]['mpoints'] += 2 if apoints > hpoints else 1 if hpoints == apoints else 0
+
+    # player_results
+    # return a list [rnd, opponent, color, result, board] for a player
+
+    def player_results(self, cid):
+        results = {}
+        for rnd in range(1, self.numrounds + 1):
+            if cid in self.byes[rnd]:
+                results[rnd] = [rnd, 0, '-', self.byes[rnd][cid], 0]
+        for rnd, games in self.games.items():
+            for [white, black, wres, bres, board] in games:
+                if white == cid:
+                    results[rnd] = [rnd, black, 'w', wres, board]
+                elif black == cid:
+                    results[rnd] = [rnd, white, 'b', bres, board]
+        return [results[rnd] for rnd in sorted(results)]
+
+    def tournament_type(self):
+        match self.params['type']:
+            case 'rr':
+                return 'Round Robin'
+            case 'team':
+                return 'Swiss Team'
+        return 'Swiss System'
+
+# ==============================
+#
+# Write TRF-16
+
+    def write_trf(self):
+        lines = [
+            '012 Generated ' + self.tournament_type() + ' ' + str(len(self.players)),
+            '022 Oslo',
+            '032 NOR',
+            '042 2026/01/01',
+            '052 2026/01/09',
+            '062 ' + str(len(self.players)),
+            '092 ' + self.tournament_type(),
+            'XXR ' + str(self.numrounds)
+            ]
+        ranking = sorted(self.players.values(), key=lambda p: (-p['points'], -p['rating'], p['cid']))
+        rank = {player['cid']: pos + 1 for pos, player in enumerate(ranking)}
+        for cid, player in self.players.items():
+            name = player['lastName'] + ', ' + player['firstName']
+            line = '001 {0:4d} {1:1s}{2:3s} {3:33s} {4:4d} {5:3s} {6:11d} {7:10s} {8:4.1f} {9:4d}'.format(
+                cid, player['sex'], '', name[0:33], player['rating'], player['federation'],
+                player['fideId'], player['birth'], player['points'], rank[cid])
+            results = {result[0]: result for result in self.player_results(cid)}
+            for rnd in range(1, self.numrounds + 1):
+                if rnd in results:
+                    [r, opponent, color, code, board] = results[rnd]
+                    line += '  {0:>4s} {1:1s} {2:1s}'.format(str(opponent).rjust(4, '0') if opponent == 0 else str(opponent), color, code)
+                else:
+                    line += '          '
+            lines.append(line.rstrip())
+        for tid, team in self.teams.items():
+            line = '013 ' + team['name'][0:32].ljust(32) + '{0:4d}'.format(team['players'][0])
+            for cid in team['players'][1:]:
+                line += ' {0:4d}'.format(cid)
+            lines.append(line)
+        return '\n'.join(lines) + '\n'
+
+# ==============================
+#
+# Write TS (Tournament Service xml)
+
+    def write_ts(self):
+        codes = {'1': '1', '=': '=', '0': '0', '+': '+', '-': '-', 'H': '=', 'Z': '-', 'U': '1'}
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+            '<Tournament Event=' + quoteattr('Generated ' + self.tournament_type()) + ' TeamEvent="' + ('Y' if self.isteam else 'N') + '">',
+            ' <Groups>',
+            '  <Group Event="A" NumRounds="{0:d}" ActiveRound="{0:d}" PointsForWin="1" PointsForLoss="0" Pairing={1}{2}>'.format(
+                self.numrounds, quoteattr(self.tournament_type()),
+                (' NumBoards="' + str(self.params['teamsize']) + '"') if self.isteam else ''),
+            '   <Rounds>']
+        for rnd in range(1, self.numrounds + 1):
+            lines.append('    <Rd ActiveElo="FIDE" IsRated="Y"/>')
+        lines.append('   </Rounds>')
+        lines.append('   <Players>')
+        teamname = {}
+        for tid, team in self.teams.items():
+            for cid in team['players']:
+                teamname[cid] = team['name']
+        for cid, player in self.players.items():
+            lines.append('    <Player StartNo="{0:d}" Teamname={1} Gn={2} Ln={3} FideRating="{4:d}" FideId="{5:d}" Federation="{6}">'.format(
+                cid, quoteattr(teamname[cid] if cid in teamname else ''), quoteattr(player['firstName']), quoteattr(player['lastName']),
+                player['rating'], player['fideId'], player['federation']))
+            lines.append('     <Results>')
+            for [rnd, opponent, color, code, board] in self.player_results(cid):
+                if code == 'U':
+                    opponent = -1
+                table = (' Table="' + str(board) + '"') if self.isteam else ''
+                lines.append('      <Game Rd="{0:d}" Clr="{1}" Opnt="{2:d}" Res="{3}"{4}/>'.format(
+                    rnd, 'B' if color == 'b' else 'W', opponent, codes[code], table))
+            lines.append('     </Results>')
+            lines.append('    </Player>')
+        lines.append('   </Players>')
+        if self.isteam:
+            lines.append('   <Teams>')
+            for tid, team in self.teams.items():
+                lines.append('    <Team StartNo="{0:d}" Teamname={1}>'.format(tid, quoteattr(team['name'])))
+                lines.append('     <Results>')
+                for [rnd, opponent, color, res, board] in self.team_results(tid):
+                    lines.append('      <Game Rd="{0:d}" Clr="{1}" Opnt="{2:d}" Res="{3}"/>'.format(rnd, color, opponent, res))
+                lines.append('     </Results>')
+                lines.append('    </Team>')
+            lines.append('   </Teams>')
+        lines += ['  </Group>', ' </Groups>', '</Tournament>']
+        return '\n'.join(lines) + '\n'
+
+    # team_results
+    # return a list [rnd, opponent, color, result, 0] for a team, white is the team with white on board 1
+
+    def team_results(self, tid):
+        results = []
+        team = self.teams[tid]
+        for rnd, games in self.games.items():
+            points = {}
+            for [white, black, wres, bres, board] in games:
+                for (cid, opp, res) in [(white, black, wres), (black, white, bres)]:
+                    if cid in team['players']:
+                        points[cid] = self.trfpoints(res)
+                        if board == 1:
+                            color = 'W' if cid == white else 'B'
+                            opponent = (opp - 1) // self.params['teamsize'] + 1
+                            oppteam = self.teams[opponent]
+            if len(points) == 0:
+                continue
+            own = sum(points.values())
+            other = len(oppteam['players']) - own
+            res = '1' if own > other else '=' if own == other else '0'
+            results.append([rnd, opponent, color, res, 0])
+        return results
+
+# ==============================
+#
+# Write Chess-JSON, converted from the TRF file
+
+    def write_json(self):
+        import io
+        from trf2json import trf2json
+        chessfile = trf2json()
+        chessfile.parse_file(self.write_trf(), False)
+        chessfile.update_tournament_random(chessfile.get_tournament(1), self.isteam)
+        f = io.StringIO()
+        helpers.json_output(f, chessfile.chessjson)
+        return f.getvalue()
+
+
+
+#### Module test ####
+
+def module_test():
+    for ttype in ['swiss', 'rr', 'team']:
+        tg = tournamentgenerator({'type': ttype, 'players': 12, 'rounds': 5, 'teamsize': 4})
+        tg.generate()
+        print(tg.write_trf())
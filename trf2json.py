@@ -11,7 +11,6 @@ Created on Mon Aug  7 16:48:53 2023
 
 import sys
 import json
-import argparse
 import time
 from decimal import *
 
@@ -19,6 +18,75 @@ import chessjson
 import berger
 import helpers
 
+# Column specifications for fixed width records, (field, start, end, type) with Python slice positions
+# Types: int and float are parsed, str is stripped, raw is kept as it is and parsed later
+
+trfspec = {
+    '001': [('startno', 4, 8, 'int'), ('sex', 9, 10, 'raw'), ('title', 10, 13, 'str'), ('name', 14, 47, 'raw'),
+            ('rating', 48, 52, 'int'), ('federation', 53, 56, 'str'), ('fideId', 57, 68, 'int'),
+            ('birth', 69, 79, 'raw'), ('points', 80, 84, 'float'), ('rank', 85, 89, 'int')],
+    '013': [('name', 4, 36, 'raw')],
+    '310': [('cid', 4, 7, 'int'), ('name', 8, 40, 'raw'), ('nickname', 41, 46, 'raw'), ('strength', 47, 53, 'int'),
+            ('matchPoints', 54, 58, 'float'), ('gamePoints', 59, 65, 'float'), ('rank', 66, 69, 'int')],
+    }
+
+# Repeated cells in a record, (end of first cell, distance between cells, cell width)
+trfcells = {'001': (99, 10, 8), '013': (40, 5, 4), '310': (75, 5, 4)}
+
+trftypes = {'int': helpers.parse_int, 'float': helpers.parse_float, 'str': str.strip, 'raw': str}
+
+# Compiled specifications, record type -> list of (field, slice, parser)
+trfdecoder = {key: [(field, slice(start, end), trftypes[ftype]) for (field, start, end, ftype) in fields]
+              for key, fields in trfspec.items()}
+
+# Result letter in a round cell -> (points, played, rated)
+trfresult = {
+    '1': ('W', True, True),
+    '=': ('D', True, True),
+    '0': ('L', True, True),
+    'U': ('P', True, False),
+    'W': ('W', True, False),
+    'D': ('D', True, False),
+    'L': ('L', True, False),
+    '?': ('U', True, False),
+    '+': ('W', False, False),
+    'F': ('W', False, False),
+    'H': ('D', False, False),
+    '-': ('Z', False, False),
+    'Z': ('Z', False, False),
+    ' ': ('Z', False, False),
+    }
+
+# TRF title -> FIDE title
+trftitles = {'g': 'GM', 'm': 'IM', 'f': 'FM', 'c': 'CM', 'wg': 'WGM', 'wm': 'WIM', 'wf': 'WFM', 'wc': 'WCM'}
+
+# decode_cell
+# Decode a round cell in a 001 record, (opponent, color, result letter, points, played, rated) or None if empty
+# The cells repeat through the file, and are decoded once
+
+trfcellcache = {}
+
+def decode_cell(sgame):
+    cell = None
+    if len(sgame.strip()) > 0:
+        color = sgame[5].lower()
+        if color != 'w' and color != 'b' and color != '-'and color != ' ':
+            color = ' '
+        result = sgame[7].upper()
+        cell = (helpers.parse_int(sgame[0:4]), color, result) + (trfresult[result] if result in trfresult else ('U', False, False))
+    trfcellcache[sgame] = cell
+    return cell
+
+# decode_record
+# Decode a fixed width record with the compiled specification, returns fields and the list of repeated cells
+
+def decode_record(key, line):
+    fields = {field: parse(line[sl]) for (field, sl, parse) in trfdecoder[key]}
+    (first, step, width) = trfcells[key]
+    cells = [line[i-width: i] for i in range(first, len(line)+1, step)]
+    return (fields, cells)
+
+
 
 class trf2json(chessjson.chessjson):
 
@@ -35,6 +103,8 @@ class trf2json(chessjson.chessjson):
         self.byelist = []
         self.forfeitedlist = []
         self.ooolist = []
+        self.gameindex = {}    # pointer from (round, white) to game in gameList
+        self.playergames = {}  # pointer from (round, player) to game in gameList
         self.o001 = {}
         self.pcompetitors = {} # pointer to player section competitors
         self.bcompetitors = {} # pointer to team competitors, index id 1st board player cid
@@ -433,61 +503,10 @@ class trf2json(chessjson.chessjson):
 # Read TRF line
 
     def parse_trf_game(self, tournament, startno, currentround, sgame, score):
-        if len(sgame.strip()) == 0: 
+        cell = trfcellcache[sgame] if sgame in trfcellcache else decode_cell(sgame)
+        if cell == None: 
             return None
-        opponent = helpers.parse_int(sgame[0:4])
-        color = sgame[5].lower()
-        if color != 'w' and color != 'b' and color != '-'and color != ' ':
-            color = ' '
-        result = sgame[7].upper()
-        points = 'U'
-        played = False
-        rated = False
-        match result:  # noqa
-            case '1':
-                points = 'W'
-                played = True
-                rated = True
-            case '=':
-                points = 'D'
-                played = True
-                rated = True
-            case '0':
-                points = 'L'
-                played = True
-                rated = True
-            case 'U':
-                points = 'P'
-                played = True
-                rated = False
-            case 'W':
-                points = 'W'
-                played = True
-                rated = False
-            case 'D':
-                points = 'D'
-                played = True
-                rated = False
-            case 'L':
-                points = 'L'
-                played = True
-                rated = False
-            case '?':
-                points = 'U'
-                played = True
-                rated = False
-            case '+' | 'F':
-                points = 'W'
-                played = False
-                rated = False
-            case 'H':
-                points = 'D'
-                played = False
-                rated = False
-            case '-' | 'Z' | ' ':
-                points = 'Z'
-                played = False
-                rated = False
+        (opponent, color, result, points, played, rated) = cell
         
         if color == 'b':
             white = opponent
@@ -517,63 +536,49 @@ class trf2json(chessjson.chessjson):
             game['wResult'] = points
         if result == 'U':
             score['pab'] = game
-        self.append_result(tournament['gameList'], game)
+        self.append_result(tournament['gameList'], game, self.gameindex)
+        self.index_game(self.gameindex[(currentround, white)])
         return game
     
+    # Add a game in gameList to the (round, player) index, the first game for a player is kept
     
-    
-    
-    def parse_trf_player(self, tournament, line):
-    #    print('parse')
-        fideName = line[14:47].rstrip()
-        names = fideName.split(',')
-        while len(names) < 2:
-            names.append('')
-        ftitle = title = line[10:13].strip()
-        match title: # noqa
-            case 'g': 
-                ftitle = 'GM'
-            case 'm': 
-                ftitle = 'IM'
-            case 'f': 
-                ftitle = 'FM'
-            case 'c': 
-                ftitle = 'CM'
-            case 'wg': 
-                ftitle = 'WGM'
-            case 'wm': 
-                ftitle = 'WIM'
-            case 'wf': 
-                ftitle = 'WFM'
-            case 'wc': 
-                ftitle = 'WCM'
+    def index_game(self, game):
+        for col in ['white', 'black']:
+            if game[col] > 0:
+                self.playergames.setdefault((game['round'], game[col]), game)
 
+
+    def parse_trf_player(self, tournament, line):
+        (fields, cells) = decode_record('001', line)
+        fideName = fields['name'].rstrip()
+        title = fields['title']
         profile = {
             'id': 0,
-            'lastName': names[0].strip(),
-            'firstName': names[1].strip(),
-            'sex': line[9:10],
-            'birth': helpers.parse_date(line[69:79]),
-            'federation': line[53:56].strip(),
-            'fideId': helpers.parse_int(line[57:68]),
+            'lastName': None,
+            'firstName': None,
+            'sex': fields['sex'],
+            'birth': None,
+            'federation': fields['federation'],
+            'fideId': fields['fideId'],
             'fideName': fideName,
-            'rating': [helpers.parse_int(line[48:52])],
-            'fideTitle': ftitle
+            'rating': [fields['rating']],
+            'fideTitle': trftitles[title] if title in trftitles else title
             }
+        self.parse_trf_name(profile, fields['birth'])
         self.append_profile(profile)
     
-        startno = helpers.parse_int(line[4:8])
+        startno = fields['startno']
         self.o001[startno] = line
         self.p001[startno] = line
-        gamePoints = helpers.parse_float(line[80:84])
+        gamePoints = fields['points']
         # score accumulates number of wins, draws and losses and will compare it to sum in order to guess score system
         competitor = {
             'cid': startno,
             'profileId': self.numProfiles,
             'present': startno > 0,
             'gamePoints': gamePoints,
-            'rank': helpers.parse_int(line[85:89]),
-            'rating': helpers.parse_int(line[48:52])
+            'rank': fields['rank'],
+            'rating': fields['rating']
             }
         score = {
             'sum': gamePoints,
@@ -585,17 +590,13 @@ class trf2json(chessjson.chessjson):
             'Z': 0
             }
         self.gamescores.append(score)
-        #section['competitors'].append(competitor)
         self.pcompetitors[competitor['cid']] = competitor
-        linelen = len(line)
         currentround = 0
         lastplayed = 0
         lastpaired = 0
-        for i in range(99, linelen+1, 10):
+        for cell in cells:
             currentround += 1
-            game = self.parse_trf_game(tournament, startno, currentround, line[i-8: i], score)
-            #if startno == 31:
-            #    print(currentround, game)
+            game = self.parse_trf_game(tournament, startno, currentround, cell, score)
             if game != None:
                 if game['played'] and currentround > lastplayed:
                     lastplayed = currentround
@@ -607,15 +608,26 @@ class trf2json(chessjson.chessjson):
             tournament['currentRound'] = lastpaired       
         return 1
 
+    # parse_trf_name
+    # Names and birth date of a 001 record
+
+    def parse_trf_name(self, profile, birth):
+        names = profile['fideName'].split(',')
+        while len(names) < 2:
+            names.append('')
+        profile['lastName'] = names[0].strip()
+        profile['firstName'] = names[1].strip()
+        profile['birth'] = helpers.parse_date(birth)
+
     def parse_trf_team(self, tournament, line, ext):
-        linelen = len(line)
-        cid = helpers.parse_int(line[4:7]) if ext else len(self.bcompetitors) + 1 
-        teamname = (line[8:40] if ext else line[4:36]).rstrip()
-        nickname = line[41:46].rstrip() if ext else ''
-        strength = helpers.parse_int(line[47:53]) if ext else 0
-        matchPoints = helpers.parse_float(line[54:58]) if ext else Decimal('0.0')
-        gamePoints = helpers.parse_float(line[59:65]) if ext else Decimal('0.0')
-        rank = helpers.parse_int(line[66:69]) if ext else 0
+        (fields, cells) = decode_record('310' if ext else '013', line)
+        cid = fields['cid'] if ext else len(self.bcompetitors) + 1 
+        teamname = fields['name'].rstrip()
+        nickname = fields['nickname'].rstrip() if ext else ''
+        strength = fields['strength'] if ext else 0
+        matchPoints = fields['matchPoints'] if ext else Decimal('0.0')
+        gamePoints = fields['gamePoints'] if ext else Decimal('0.0')
+        rank = fields['rank'] if ext else 0
         team = {
             'id': 0,
             'teamName': teamname,
@@ -634,22 +646,18 @@ class trf2json(chessjson.chessjson):
             'tieBreakScore': [],
             'cplayers': []
             }
-        #cplayers = tournament['playerSection']['competitors']
-        #section['competitors'].append(competitor)
         board = 0
-        for i in range(75 if ext else 40, linelen+1, 5):
+        for cell in cells:
             board += 1
-            pid = helpers.parse_int(line[i-4:i])
+            pid = helpers.parse_int(cell)
             if pid == 0:
                 continue
             if ext:
                  competitor['cplayers'].append(self.pcompetitors[pid])
             else:
                 competitor['cplayers'].append(pid)
-            #players.append(cplayers[pid-1]['profileId'])
             self.pcompetitors[pid]['teamId'] = teamid
             self.cboard[pid] = board
-            #self.cteam[pid] = competitor['cid']
         if ext:
             self.tcompetitors[cid] = competitor
         else:
@@ -1260,9 +1268,10 @@ class trf2json(chessjson.chessjson):
 # More 
                                                      
     def export_trf(self, params):
-        #print(self.event)
-        with open(params['output_file'], 'w') as f:
-            json.dump(self.event, f, indent=2)
+        from json2trf import json2trf
+        tournamentno = helpers.parse_int(str(params['tournament_number'])) if 'tournament_number' in params else 1
+        version = params['output_format'] if 'output_format' in params else 'TRF'
+        json2trf(self).export_trf(params['output_file'], max(tournamentno, 1), version)
         
 
     def prepare_player_section(self, tournament):
@@ -1369,18 +1378,15 @@ class trf2json(chessjson.chessjson):
 
         # Step 1
         # Create the identification, 
-        #     a game in round 3 between team 4 and 8 is identified by 3-8-4 regardless of white and black
-        #     a game in round 6 with team 12 and no opponent is identified by 6-12-0 
+        #     a game in round 3 between team 4 and 8 is identified by (3, 8, 4) regardless of white and black
+        #     a game in round 6 with team 12 and no opponent is identified by (6, 12, 0) 
 
         for game in games: 
             game['board'] = 0
             rnd = game['round']
             wt = cteam[game['white']]
             bt = cteam[game['black']] if 'black' in game and game['black'] > 0 else 0
-            if wt > bt:
-                index = str(rnd) + '-' + str(wt) + '-' + str(bt)
-            else:
-                index = str(rnd) + '-' + str(bt) + '-' + str(wt)
+            index = (rnd, wt, bt) if wt > bt else (rnd, bt, wt)
             if bt > 0:
                 if not (index in matches):
                     matchid += 1
@@ -1420,13 +1426,13 @@ class trf2json(chessjson.chessjson):
         
         
         for forfeited in self.forfeitedlist:
-            key = str(forfeited['round']) + '-' + str(max(forfeited['white'], forfeited['black'])) + '-' + str(min(forfeited['white'], forfeited['black']))
+            key = (forfeited['round'], max(forfeited['white'], forfeited['black']), min(forfeited['white'], forfeited['black']))
             if key not in matches:
                 matchid += 1
                 matches[key] = { 'id':matchid, 'white': forfeited['white'], 'black': forfeited['black'], 'games':[] }
  
         for ooo in self.ooolist:
-            key = str(ooo['round']) + '-' + str(max(ooo['oooteam'], ooo['otherteam'])) + '-' + str(min(ooo['oooteam'], ooo['otherteam']))
+            key = (ooo['round'], max(ooo['oooteam'], ooo['otherteam']), min(ooo['oooteam'], ooo['otherteam']))
             if key not in matches:
                 matchid += 1
                 matches[key] = { 'id':matchid,  'games':[] }
@@ -1435,16 +1441,14 @@ class trf2json(chessjson.chessjson):
         # Merge games from bye list into match list
         # Example
         # Before:
-        # matches: 8-17-4 contains 3 games, byes: 8-17-0 contains two Z-byes, 8-4-0 contains one forfeited win and one Z-bye
+        # matches: (8, 17, 4) contains 3 games, byes: (8, 17, 0) contains two Z-byes, (8, 4, 0) contains one forfeited win and one Z-bye
         # After:
-        # matches: 8-17-4 contains 7 games, byes: none
+        # matches: (8, 17, 4) contains 7 games, byes: none
 
         
-        for key, value in matches.items():
-            (rnd, p1, p2) = key.split('-')
-            arg = int(p1)
-            b1 = rnd + '-' + p1  + '-'+ '0' 
-            b2 = rnd + '-' + p2  + '-'+ '0' 
+        for (rnd, p1, p2), value in matches.items():
+            b1 = (rnd, p1, 0) 
+            b2 = (rnd, p2, 0) 
             if b1 in byes:
                 value['games'].extend(byes.pop(b1)['games'])
             if b2 in byes:
@@ -1496,28 +1500,22 @@ class trf2json(chessjson.chessjson):
               matches[key] = byes[key]
 
         # Step 6
-        # Create a pointer dict tmatches such that this is an index for round and team
-        # 8-17-4 got two pointers 8-17 and 8-4
+        # Create a pointer dict tforfeited for round and white team in the forfeited list
         
         
-        tmatches = {}
-        for key, tmatch in matches.items():
-            (rnd, p1, p2) = key.split('-')
-            tkey = rnd + '-' + p1
-            tmatches[tkey] = tmatch
-            if int(p2) > 0:
-                tkey = rnd + '-' + p2
-                tmatches[tkey] = tmatch
+        tforfeited = {}
+        for pos, forfeited in enumerate(self.forfeitedlist):
+            tforfeited.setdefault((forfeited['round'], forfeited['white']), (pos, forfeited))
 
         # Step 7
         # Update out of order 
             
         for ooo in self.ooolist:
-            tmatch = tmatches[str(ooo['round']) + '-' + str(ooo['oooteam'])]
+            rnd = ooo['round']
             for i in range(teamsize):
                 player = ooo['order'][i]
                 if player > 0:
-                    list(filter(lambda game: game['white'] == player or game['black'] == player, tmatch['games']))[0]['board'] = i + 1
+                    self.playergames[(rnd, player)]['board'] = i + 1
                     #helpers.json_output('-', tmatch['games'])
                             
                     
@@ -1525,10 +1523,7 @@ class trf2json(chessjson.chessjson):
          # Sort games according to strength and previous ooo-list
               
 
-        for key, tmatch in matches.items():
-            (rnd, p1, p2) = key.split('-')
-            arg = int(p1)
-            pp = False
+        for (rnd, arg, p2), tmatch in matches.items():
             teams = {}
             for game in tmatch['games']:
                 for col in ['white', 'black']:
@@ -1537,84 +1532,72 @@ class trf2json(chessjson.chessjson):
                         if tcol not in teams:
                             teams[tcol] = []
                         teams[tcol].append(game)
-            #if int(rnd) == 12 and arg == 30:
-            #    print('Teams', teams)
             for key, games in teams.items():
-                #if int(rnd) == 12 and arg == 30:
-                #    print('GamesA', games)
-                #games = sorted(games, key=lambda game: (game['round'] == 0, game['round'], game['black'] == 0,  game['black'] == 0 and game['wResult'] == 'Z' )  )
                 games = sorted(games, key=lambda game: (game['board'] == 0, game['board'],  game['black'] == 0 and game['wResult'] == 'Z', self.cboard[game['white']] if self.cteam[game['white']] == arg else self.cboard[game['black']] ))
-               
-                #if arg == 11:
-                #    for game in games:
-                #        print('GamesB', rnd, game['white'], game['black'], game['board'] == 0, game['board'],  game['black'] == 0 and game['wResult'] == 'Z', self.cboard[game['white']] if self.cteam[game['white']] == arg else self.cboard[game['black']] )
-
+                # Games with a board keep it, the others fill the empty boards in sorted order
+                placed = {}
+                unplaced = []
+                for game in games:
+                    if game['board'] == 0:
+                        unplaced.append(game)
+                    elif game['board'] not in placed:
+                        placed[game['board']] = game
+                unplaced.reverse()
                 for i in range(teamsize):
-                     sg = list(filter(lambda game: game['board'] == i + 1 or game['board'] == 0, games))
-                     #if int(rnd) == 12 and arg == 30:
-                     #    print('TSg', sg)
-                     sg[0]['board'] = i + 1
-            #if int(rnd) == 12 and arg == 30:
-            #    print('Teams', teams)
+                    if i + 1 not in placed:
+                        unplaced.pop()['board'] = i + 1
 
             if len(teams) == 2:
                 (team1, team2) = teams.keys()
-                forfeitedlist = list(filter(lambda forfeited: int(rnd) == forfeited['round'] and (team1 == forfeited['white'] or team2 == forfeited['white']), self.forfeitedlist))
-                #print('Test', rnd, team1, team2)
-                #if (False and team1 == 33 and team2 ==23):
-                    #print(forfeitedlist, self.forfeitedlist[0])
-                #    pp = True
- 
+                boards = self.match_boards(tmatch['games'], teamsize)
+                forfeitedlist = [tforfeited[(rnd, team)] for team in [team1, team2] if (rnd, team) in tforfeited]
                 if len(forfeitedlist) > 0:
-                    forfeited = forfeitedlist[0]
+                    forfeited = min(forfeitedlist, key=lambda elem: elem[0])[1]
                     if team2 == forfeited[tindex[wcol]]:
                         (team2, team1) = (team1, team2)
                 else:
                     for i in range(teamsize):
                         col = seq[i]
-                        pair = list(filter(lambda game: game['board'] == i + 1, tmatch['games']))
+                        pair = boards[i + 1]
                         if len(pair) < 2:
                             continue
                         (pairw, pairb) = pair
                         if pairw['id'] == pairb['id']:
-                            teamw = self.cteam(pairw['white'])
-                            teamb = self.cteam(pairb['black'])
+                            teamw = self.cteam[pairw['white']]
                             if (wcol == 'W') ^ (wcol == col) ^ (teamw == team1):
                                 (team2, team1) = (team1, team2)
                                 break                                
                   
                 for i in range(teamsize):
                     col = seq[i]
-                    pair = list(filter(lambda game: game['board'] == i + 1, tmatch['games']))
+                    pair = boards[i + 1]
                     if len(pair) < 2:
                         continue
                     (pairw, pairb) = pair
                     if (pairw['id'] != pairb['id']):
                         teamw = self.cteam[pairw['white']]
-                        #teamb = self.cteam[pairb['black']]
                         if (wcol == 'W') ^ (wcol == col) ^ (teamw == team1):
                             (pairb, pairw) = (pairw, pairb)
                         pairw['black'] = pairb['white']
                         pairw['bResult'] = pairb['wResult']
                         pairb['id'] = 0
-                    #if self.cteam(pairw['white']) == team2 
-            tmatch['games'] = list(filter(lambda game: game['id'] != 0, tmatch['games'])) 
-        tournament['gameList'] = list(filter(lambda game: game['id'] != 0, tournament['gameList']))    
+            tmatch['games'] = [game for game in tmatch['games'] if game['id'] != 0] 
+        tournament['gameList'] = [game for game in tournament['gameList'] if game['id'] != 0]    
                              
         # Step 9
         # Deside score
         
         #print('------------------')
         for key, tmatch in matches.items():
-            (rnd, p1, p2) = key.split('-')
-            arg = int(p1)
             games = sorted(tmatch['games'], key=lambda game: (game['board'] == 0, game['board']))
+            boards = self.match_boards(games, teamsize)
             #if int(rnd) == 12 and (arg == 28 or arg == 30):
             #    print ("Debug sorted", arg, games)
             scorename = tournament['gameScoreSystem']
             scoresystem = self.scoreLists[scorename]
             if not 'P' in scoresystem:
                 scoresystem['P'] = 'D'
+                self.clear_scoretables()
             reverse = self.scoreLists['_reverse']
             #helpers.json_output('-', games)
             white = self.cteam[games[0]['white']]
@@ -1632,17 +1615,7 @@ class trf2json(chessjson.chessjson):
             #print('GEO:', games)
             for i in range(0, teamsize):
                 ind += 1
-                game = None
-                g0 =  list(filter(lambda game: 'board' in game and game['board'] == ind , games))
-                #if len(g0) ==  0:
-                game = g0[0]
-                #else:
-                #    g1 =  list(filter(lambda game: game['black'] > 0 or game['wResult'] != 'L' or game['played'] , games))
-                #    if len(g1) > 0:
-                #        game = g1[0]
-                #    else:
-                #        game = games[0]
-                #game['board'] = ind
+                game = boards[ind][0]
                 if preres == None:
                     preres = game['wResult']
                 played = played or game['played']
@@ -1655,9 +1628,6 @@ class trf2json(chessjson.chessjson):
                 else:
                     wscore += bs
                     bscore += ws
-                games.remove(game)
-                #if ind == 4:
-                #    break
             tmatch['played'] = played
             
             wResult = wcol.lower() + 'Result'
@@ -1697,6 +1667,17 @@ class trf2json(chessjson.chessjson):
         #helpers.json_output('c:/temp/games.json', tournament['gameList'])  
 
 
+    # Board array for a match, boards[i] is the list of games on board i, board 0 is not placed
+
+    def match_boards(self, games, teamsize):
+        boards = [[] for i in range(teamsize + 1)]
+        for game in games:
+            board = game['board']
+            if board >= len(boards):
+                boards.extend([[] for i in range(board + 1 - len(boards))])
+            boards[board].append(game)
+        return boards
+
     def update_team_score(self, tournament):
         for competitor in tournament['competitors']:
             pass
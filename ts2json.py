@@ -10,6 +10,7 @@ Created on Thu Oct 19 11:55:32 2023
 """
 
 import sys
+import io
 import json
 from decimal import *
 import xml.etree.ElementTree as ET
@@ -102,40 +103,75 @@ class ts2json(chessjson.chessjson):
 #
 # Read TS file
 
-    def parse_file(self, lines, verbose):
-        event = ET.fromstring(lines)
-        if event.tag != 'Tournament':
-            return 1  # Not a TS file 
-        self.parse_ts_tournament_attrib(event.attrib)
-        for child in event:
-            match child.tag:
-                case 'Web':
-                    self.parse_ts_web(child.attrib)
-                case 'Groups':
-                    for key, value in child.attrib.items():
-                        match key:
-                            case 'Num':
-                                '3'
-                            case 'SeparateFile':
-                                'N'
-                    tournamentno = 0 
-                    for group in child:
-                        if group.tag == 'Group':
-                            tournamentno += 1
-                            self.pcompetitors = {} # pointer to player section competitors
-                            self.bcompetitors = {} # pointer to team competitors via 1st board player
-                            self.tcompetitors = {} # pointer to team section competitors
-
-                            tournament = self.parse_ts_group(group, tournamentno)
-                            if self.isteam:
-                                self.prepare_team_section(tournament)
-                            else:
-                                self.prepare_player_section(tournament)
-                            self.update_results(tournament['gameList'])
-                            self.update_tournament_rating(tournament)
-                            self.update_tournament_teamcompetitors(tournament)
-                            self.update_tournament_random(tournament, self.isteam)
+    # parse_file
+    #   lines: the TS file as a string, or a (binary) stream
+    #   tournamentno: 0 = read all groups, n = read only group n
+    # The file is read with iterparse, each Player and Team is converted
+    # as soon as it is complete and removed from the tree, and the group is
+    # finished when the Group element ends. Only a small part of the xml
+    # document is in memory at any time.
 
+    def parse_file(self, lines, verbose, tournamentno=0):
+        source = io.StringIO(lines) if isinstance(lines, str) else lines
+        path = []        # elements from root to current element
+        groupno = 0
+        tournament = None
+        rank = 0
+        for (action, elem) in ET.iterparse(source, events=('start', 'end')):
+            if action == 'start':
+                path.append(elem)
+                match len(path):
+                    case 1:
+                        if elem.tag != 'Tournament':
+                            return 1  # Not a TS file 
+                        self.parse_ts_tournament_attrib(elem.attrib)
+                    case 3:
+                        if elem.tag == 'Group' and path[1].tag == 'Groups':
+                            groupno += 1
+                            if tournamentno == 0 or tournamentno == groupno:
+                                self.pcompetitors = {} # pointer to player section competitors
+                                self.bcompetitors = {} # pointer to team competitors via 1st board player
+                                self.tcompetitors = {} # pointer to team section competitors
+                                tournament = self.parse_ts_group(elem, groupno)
+                    case 4:
+                        rank = 0
+                continue
+            path.pop()
+            parent = path[-1] if len(path) > 0 else None
+            match len(path):
+                case 1:
+                    match elem.tag:
+                        case 'Web':
+                            self.parse_ts_web(elem.attrib)
+                        case 'Groups':
+                            for key, value in elem.attrib.items():
+                                match key:
+                                    case 'Num':
+                                        '3'
+                                    case 'SeparateFile':
+                                        'N'
+                case 2:
+                    if elem.tag == 'Group' and tournament != None:
+                        self.finish_ts_group(tournament)
+                        tournament = None
+                case 3:
+                    if tournament != None:
+                        self.parse_ts_group_child(elem, tournament)
+                case 4:
+                    if tournament == None:
+                        pass         # group not selected
+                    elif parent.tag == 'Players' and elem.tag == 'Player':
+                        rank += 1
+                        self.parse_ts_player(elem, tournament, rank)
+                    elif parent.tag == 'Teams' and elem.tag == 'Team':
+                        rank += 1
+                        self.parse_ts_team(elem, tournament, rank)
+                    else:
+                        continue     # keep it, parsed with its parent 
+                case _:
+                    continue         # parsed with its parent
+            if parent != None:
+                parent.remove(elem)
         return
                     
 
@@ -337,31 +373,48 @@ class ts2json(chessjson.chessjson):
 
         
         self.parse_ts_group_attrib(group.attrib, tournament)
-        for child in group:
-            match child.tag:
-                case 'Rounds':
-                    self.parse_ts_group_rounds(child, tournament)
-                case 'TieBreaksBy':
-                    self.parse_ts_group_order(child, tournament, 'TieBreaksBy')
-                case 'IndividualTieBreaksBy':
-                    self.parse_ts_group_order(child, tournament, 'IndividualTieBreaksBy')
-                case 'PairingGroupBy':
-                    self.parse_ts_group_order(child, tournament, 'PairingGroupBy')
-                case 'PrizeGroups':
-                    self.parse_ts_group_prize(child, tournamentno)
-                case 'ColWidths':
-                    self.parse_ts_group_layout(child, tournamentno)
-                case 'Reportsettings':
-                    self.parse_ts_group_report(child, tournamentno)
-                case 'Players':
-                    self.parse_ts_group_players(child, tournament)
-                case 'Teams':
-                    self.parse_ts_group_teams(child, tournament)
-                case _:
-                    self.print_warning('parse_ts_group tag: ' + child.tag + ' not matched')
-
         self.event['tournaments'].append(tournament)
         return tournament
+
+    # parse_ts_group_child
+    #   Parse a child of Group. Player and Team elements are parsed and
+    #   removed while reading, Players and Teams only have the attributes left.
+
+    def parse_ts_group_child(self, child, tournament):
+        tournamentno = tournament['tournamentNo']
+        match child.tag:
+            case 'Rounds':
+                self.parse_ts_group_rounds(child, tournament)
+            case 'TieBreaksBy':
+                self.parse_ts_group_order(child, tournament, 'TieBreaksBy')
+            case 'IndividualTieBreaksBy':
+                self.parse_ts_group_order(child, tournament, 'IndividualTieBreaksBy')
+            case 'PairingGroupBy':
+                self.parse_ts_group_order(child, tournament, 'PairingGroupBy')
+            case 'PrizeGroups':
+                self.parse_ts_group_prize(child, tournamentno)
+            case 'ColWidths':
+                self.parse_ts_group_layout(child, tournamentno)
+            case 'Reportsettings':
+                self.parse_ts_group_report(child, tournamentno)
+            case 'Players':
+                self.parse_ts_group_players(child, tournament)
+            case 'Teams':
+                self.parse_ts_group_teams(child, tournament)
+            case _:
+                self.print_warning('parse_ts_group tag: ' + child.tag + ' not matched')
+        return
+
+    def finish_ts_group(self, tournament):
+        if self.isteam:
+            self.prepare_team_section(tournament)
+        else:
+            self.prepare_player_section(tournament)
+        self.update_results(tournament['gameList'])
+        self.update_tournament_rating(tournament)
+        self.update_tournament_teamcompetitors(tournament)
+        self.update_tournament_random(tournament, self.isteam)
+        return
  
 
 
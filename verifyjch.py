@@ -17,10 +17,6 @@ import datetime
 import codecs
 import helpers
 import jsonscheme
-from chessjson import chessjson
-from trf2json import trf2json
-from ts2json import ts2json
-from tiebreak import tiebreak
 from decimal import *
 
 # ==============================
@@ -136,13 +132,16 @@ def read_input_file(params):
     # Read input file
     match(params['file_format']):
         case 'JSON':
+            from chessjson import chessjson
             chessfile = chessjson()
             charset = "utf-8"
         case 'TRF':
+            from trf2json import trf2json
             chessfile = trf2json()
             charset = "latin1"
     
         case 'TS':
+            from ts2json import ts2json
             chessfile = ts2json()
             charset = "ascii"
         case _: